@@ -0,0 +1,88 @@
+"""
+Compare memory use and lookup time of sets of 20-byte binary SHAs:
+
+    python benchmarks/binsha_set.py 1000000 10000000
+"""
+
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import click
+
+# benchmark the checkout this script is in, whether or not git_utils is installed
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from git_utils.util import BinshaSet, LazySet  # noqa: E402
+
+
+def iter_binshas(count: int, seed: int = 0) -> Iterator[bytes]:
+    """
+    Generate `count` pseudo-random 20-byte SHAs (deterministically, per `seed`).
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield rng.getrandbits(160).to_bytes(20, "little")
+
+
+def measure(
+    factory: Callable[[Iterable[bytes]], Iterable[bytes]],
+    count: int,
+    hits: List[bytes],
+    misses: List[bytes],
+) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    container = factory(iter_binshas(count))
+    # force lazy sets to consume all of their input
+    assert len(container) == count
+    memory_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    gc.collect()
+    # measure time separately, since tracing memory allocations slows everything down
+    started = time.perf_counter()
+    container = factory(iter_binshas(count))
+    assert len(container) == count
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    assert all(binsha in container for binsha in hits)
+    assert not any(binsha in container for binsha in misses)
+    lookup_seconds = time.perf_counter() - started
+    return {
+        "build_seconds": build_seconds,
+        "bytes_per_item": memory_bytes / count,
+        "lookup_microseconds": lookup_seconds / (len(hits) + len(misses)) * 1e6,
+    }
+
+
+FACTORIES = {
+    "set": set,
+    "LazySet": LazySet,
+    "BinshaSet": BinshaSet,
+}
+
+
+@click.command()
+@click.argument("counts", type=int, nargs=-1)
+@click.option("-l", "--lookups", default=100_000, show_default=True)
+def main(counts: List[int], lookups: int):
+    for count in counts or (1_000_000, 10_000_000):
+        hits = random.sample(list(iter_binshas(count)), min(count, lookups))
+        misses = [os.urandom(20) for _ in range(lookups)]
+        for name, factory in FACTORIES.items():
+            result = measure(factory, count, hits, misses)
+            print(
+                f"{count:>11,} {name:<10}"
+                f" {result['bytes_per_item']:6.1f} bytes/item"
+                f" {result['build_seconds']:7.2f}s build"
+                f" {result['lookup_microseconds']:6.2f}µs/lookup"
+            )
+
+
+if __name__ == "__main__":
+    main()
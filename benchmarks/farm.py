@@ -0,0 +1,174 @@
+"""
+Generate a "farm" of synthetic git repositories for benchmarking:
+
+    python benchmarks/farm.py /tmp/farm --repos 200 --commits 1000
+"""
+
+from pathlib import Path
+from typing import Callable, Iterator
+import json
+import shutil
+import subprocess
+
+import click
+
+IDENTITY = "Bench <bench@example.com>"
+# fixed author/committer timestamp, so that farms are reproducible
+EPOCH = 1_600_000_000
+
+
+def git(cwd: Path, *args: str, **kwargs) -> subprocess.CompletedProcess:
+    name, _, email = IDENTITY.partition(" <")
+    config = ["-c", f"user.name={name}", "-c", f"user.email={email.rstrip('>')}"]
+    return subprocess.run(
+        ["git", *config, *args], cwd=cwd, check=True, capture_output=True, **kwargs
+    )
+
+
+def iter_fast_import(
+    commits: int, branches: int, tags: int, files: int
+) -> Iterator[str]:
+    """
+    Generate a `git fast-import` stream with a linear history of `commits` commits on
+    "main" (each modifying one of `files` files), `branches` branches with two extra
+    commits each, and `tags` lightweight tags, spread evenly over the history.
+    """
+    for mark in range(1, commits + 1):
+        content = f"{mark}\n"
+        yield (
+            f"commit refs/heads/main\nmark :{mark}\n"
+            f"committer {IDENTITY} {EPOCH + mark} +0000\n"
+            f"data {len(str(mark))}\n{mark}\n"
+            f"M 644 inline file{mark % files}.txt\ndata {len(content)}\n{content}\n"
+        )
+    for index in range(branches):
+        base = commits - index * commits // max(branches, 1)
+        yield f"reset refs/heads/branch{index}\nfrom :{base}\n\n"
+        for extra in range(2):
+            content = f"branch{index} {extra}\n"
+            yield (
+                f"commit refs/heads/branch{index}\n"
+                f"committer {IDENTITY} {EPOCH + commits + extra} +0000\n"
+                f"data 6\nextra\n"
+                f"M 644 inline branch{index}.txt\ndata {len(content)}\n{content}\n"
+            )
+    for index in range(tags):
+        yield f"reset refs/tags/v{index}\nfrom :{1 + index * commits // tags}\n\n"
+
+
+def make_repo(
+    path: Path, commits: int, branches: int, tags: int, files: int, untracked: int
+):
+    git(path.parent, "init", "-q", "-b", "main", path.name)
+    stream = "".join(iter_fast_import(commits, branches, tags, files))
+    git(path, "fast-import", "--quiet", input=stream.encode())
+    git(path, "reset", "-q", "--hard", "main")
+    for index in range(untracked):
+        directory = path / "untracked" / f"dir{index % 32}"
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"file{index}.txt").write_text(f"{index}\n" * 16)
+
+
+def add_remote(path: Path, remote_path: Path, unpushed: int):
+    """
+    Clone `path` into bare `remote_path`, add it as remote "origin" (via a file://
+    URL), and then add `unpushed` local commits.
+    """
+    git(path, "clone", "-q", "--bare", ".", str(remote_path))
+    git(path, "remote", "add", "origin", remote_path.resolve().as_uri())
+    git(path, "fetch", "-q", "origin")
+    for index in range(unpushed):
+        git(path, "commit", "-q", "--allow-empty", "-m", f"unpushed {index}")
+
+
+def make_farm(
+    root: Path,
+    repos: int,
+    commits: int,
+    branches: int,
+    tags: int,
+    files: int,
+    untracked: int,
+    remotes: int,
+) -> Path:
+    """
+    Create repos in `root`/repos (and their remotes in `root`/remotes), unless `root`
+    already contains a farm generated with the same parameters; return `root`.
+    """
+    params = {
+        "repos": repos,
+        "commits": commits,
+        "branches": branches,
+        "tags": tags,
+        "files": files,
+        "untracked": untracked,
+        "remotes": remotes,
+    }
+    params_path = root / "params.json"
+    if params_path.exists() and json.loads(params_path.read_text()) == params:
+        return root
+    if params_path.exists():
+        shutil.rmtree(root)
+    elif root.exists() and any(root.iterdir()):
+        raise FileExistsError(f"Not a farm (no params.json): {root}")
+    (root / "repos").mkdir(parents=True)
+    (root / "remotes").mkdir()
+    for index in range(repos):
+        path = root / "repos" / f"repo{index:04d}"
+        make_repo(
+            path,
+            commits=commits,
+            branches=branches,
+            tags=tags,
+            files=files,
+            untracked=untracked if index % 10 == 0 else 0,
+        )
+        if index < remotes:
+            add_remote(path, root / "remotes" / f"{path.name}.git", unpushed=3)
+    params_path.write_text(json.dumps(params))
+    return root
+
+
+def farm_options(function: Callable) -> Callable:
+    """
+    Add options for the parameters of `make_farm` to click command `function`.
+    """
+    options = [
+        click.option(
+            "--repos", default=200, show_default=True, help="Number of repos."
+        ),
+        click.option(
+            "--commits", default=500, show_default=True, help="Commits per repo."
+        ),
+        click.option(
+            "--branches", default=10, show_default=True, help="Branches per repo."
+        ),
+        click.option("--tags", default=20, show_default=True, help="Tags per repo."),
+        click.option("--files", default=50, show_default=True, help="Files per repo."),
+        click.option(
+            "--untracked",
+            default=2000,
+            show_default=True,
+            help="Untracked files in every tenth repo.",
+        ),
+        click.option(
+            "--remotes",
+            default=20,
+            show_default=True,
+            help="Number of repos with a file:// remote (and unpushed commits).",
+        ),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+@click.command()
+@click.argument("root", type=click.Path(file_okay=False))
+@farm_options
+def main(root: str, **params):
+    make_farm(Path(root), **params)
+
+
+if __name__ == "__main__":
+    main()
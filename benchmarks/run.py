@@ -0,0 +1,304 @@
+"""
+Time git-utils operations on a farm of synthetic repositories (see farm.py) and
+against a local stub of the GitHub API, and write the results as JSON:
+
+    python benchmarks/run.py -o before.json
+    git checkout ...
+    python benchmarks/run.py -o after.json --compare before.json
+"""
+
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import git
+
+from farm import farm_options, make_farm
+
+# benchmark the checkout this script is in, whether or not git_utils is installed
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from git_utils import diskusage  # noqa: E402
+from git_utils import repo as repo_utils  # noqa: E402
+from git_utils import util  # noqa: E402
+from git_utils.github.client import Client  # noqa: E402
+import git_utils  # noqa: E402
+
+# reuse the stub GitHub server from the tests
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tests"))
+from github_stub import StubGitHub, paginate  # noqa: E402
+
+
+class Context:
+    def __init__(self, farm: Path, latency: float, concurrency: int):
+        self.exit_stack = ExitStack()
+        self.farm = farm
+        self.repos_dir = farm / "repos"
+        self.git_dirs = sorted(self.repos_dir.iterdir())
+        self.latency = latency
+        self.concurrency = concurrency
+
+
+# each benchmark takes a Context, does any setup, and returns the function to time
+BENCHMARKS: Dict[str, Callable[[Context], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    def decorator(function: Callable[[Context], Callable[[], Any]]):
+        BENCHMARKS[name] = function
+        return function
+
+    return decorator
+
+
+@benchmark("repo.find")
+def repo_find(context: Context):
+    return lambda: list(repo_utils.find(context.repos_dir))
+
+
+@benchmark("repo.status")
+def repo_status(context: Context):
+    repos = [git.Repo(git_dir) for git_dir in context.git_dirs]
+    return lambda: [repo_utils.status(repo, branch=True) for repo in repos]
+
+
+@benchmark("repo.heads_commits")
+def repo_heads_commits(context: Context):
+    repos = [git.Repo(git_dir) for git_dir in context.git_dirs]
+    return lambda: [repo_utils.heads_commits(repo) for repo in repos]
+
+
+@benchmark("repo.iter_commits_not_in_remotes")
+def repo_iter_commits_not_in_remotes(context: Context):
+    repos = [git.Repo(git_dir) for git_dir in context.git_dirs]
+    repos = [repo for repo in repos if repo.remotes]
+    return lambda: [repo_utils.iter_commits_not_in_remotes(repo) for repo in repos]
+
+
+@benchmark("diskusage.disk_usage")
+def diskusage_disk_usage(context: Context):
+    return lambda: diskusage.disk_usage(context.repos_dir)
+
+
+@benchmark("diskusage.disk_usage(jobs=4)")
+def diskusage_disk_usage_jobs(context: Context):
+    return lambda: diskusage.disk_usage(context.repos_dir, jobs=4)
+
+
+@benchmark("diskusage.objects_size")
+def diskusage_objects_size(context: Context):
+    repos = [git.Repo(git_dir) for git_dir in context.git_dirs]
+    return lambda: [diskusage.objects_size(repo) for repo in repos]
+
+
+@benchmark("util.LazySet")
+def util_LazySet(context: Context):
+    repo = git.Repo(context.git_dirs[0])
+    # the root commit is listed last, so checking for it consumes everything
+    (root_hexsha,) = repo.git.rev_list("--max-parents=0", "main").split()
+    root_binsha = bytes.fromhex(root_hexsha)
+
+    def run():
+        binshas = util.LazySet(repo_utils.iter_heads_binshas(repo))
+        assert root_binsha in binshas
+
+    return run
+
+
+@benchmark("util.BinshaSet")
+def util_BinshaSet(context: Context):
+    repo = git.Repo(context.git_dirs[0])
+    (root_hexsha,) = repo.git.rev_list("--max-parents=0", "main").split()
+    root_binsha = bytes.fromhex(root_hexsha)
+
+    def run():
+        binshas = util.BinshaSet(repo_utils.iter_heads_binshas(repo))
+        assert root_binsha in binshas
+
+    return run
+
+
+@benchmark("git-summary")
+def git_summary(context: Context):
+    # run as a separate process, to include start-up time, importing the same
+    # git_utils as this process
+    args = [sys.executable, "-m", "git_utils.summary", "--no-cache"]
+    root = str(Path(git_utils.__file__).resolve().parents[1])
+    pythonpath = os.pathsep.join(filter(None, [root, os.getenv("PYTHONPATH")]))
+    env = {**os.environ, "PYTHONPATH": pythonpath}
+    return lambda: subprocess.run(
+        args, cwd=context.repos_dir, env=env, check=True, stdout=subprocess.DEVNULL
+    )
+
+
+def stub_client(server: StubGitHub, concurrency: int) -> Client:
+    client = Client(concurrency=concurrency)
+    client.scheme = "http"
+    client.netloc = server.netloc
+    return client
+
+
+@benchmark("Client.iter_responses")
+def github_iter_responses(context: Context):
+    server = context.exit_stack.enter_context(StubGitHub(context.latency))
+    server.routes["/orgs/example/repos"] = [{"id": i} for i in range(2000)]
+    client = stub_client(server, context.concurrency)
+    return lambda: list(client.iter_responses("/orgs/example/repos"))
+
+
+@benchmark("Client.iter_all_commits")
+def github_iter_all_commits(context: Context):
+    server = context.exit_stack.enter_context(StubGitHub(context.latency))
+    main = [f"{i:040x}" for i in range(1000, 0, -1)]
+    # 50 branches, each with a few unique commits on top of some commit on main
+    history = {"main": main}
+    for index in range(50):
+        history[f"branch{index:02d}"] = [f"b{index:02d}{i:037x}" for i in range(3)]
+        history[f"branch{index:02d}"] += main[index * 10 :]
+    server.routes["/repos/example/repo/branches"] = [
+        {"name": name} for name in sorted(history)
+    ]
+    server.routes["/repos/example/repo/commits"] = lambda params, headers: paginate(
+        [{"sha": sha} for sha in history[params["sha"]]],
+        "/repos/example/repo/commits",
+        params,
+    )
+    client = stub_client(server, context.concurrency)
+    return lambda: list(client.iter_all_commits("example", "repo"))
+
+
+def run_benchmark(
+    name: str, context: Context, repeat: int, warmup: int = 1
+) -> Dict[str, Any]:
+    function = BENCHMARKS[name](context)
+    for _ in range(warmup):
+        function()
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - started)
+    return {
+        "seconds": seconds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+    }
+
+
+def git_describe() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def print_comparison(baseline: dict, results: dict):
+    click.echo(
+        f"{'benchmark':<40} {'baseline':>10} {'current':>10} {'ratio':>7}", err=True
+    )
+    for name, result in results["benchmarks"].items():
+        if (base := baseline["benchmarks"].get(name)) is None:
+            continue
+        ratio = result["median"] / base["median"]
+        color = "red" if ratio > 1.1 else "green" if ratio < 0.9 else None
+        click.echo(
+            f"{name:<40} {base['median']:10.4f} {result['median']:10.4f} "
+            + click.style(f"{ratio:7.2f}", fg=color),
+            err=True,
+        )
+
+
+@click.command()
+@click.option(
+    "--farm",
+    type=click.Path(file_okay=False),
+    default=os.path.join(tempfile.gettempdir(), "git-utils-farm"),
+    show_default=True,
+    help="Directory to generate (or reuse) synthetic repositories in.",
+)
+@farm_options
+@click.option(
+    "--latency",
+    default=0.05,
+    show_default=True,
+    help="Seconds of latency of each request to the stub GitHub API.",
+)
+@click.option(
+    "--concurrency",
+    default=4,
+    show_default=True,
+    help="Concurrency of the GitHub API client.",
+)
+@click.option("-r", "--repeat", default=5, show_default=True)
+@click.option(
+    "-k",
+    "--keyword",
+    "keywords",
+    multiple=True,
+    help="Only run benchmarks with names containing this (repeatable).",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="Write results as JSON to this file.",
+)
+@click.option(
+    "--compare",
+    type=click.File(),
+    help="Print comparison to results previously written with --output.",
+)
+def main(
+    farm: str,
+    latency: float,
+    concurrency: int,
+    repeat: int,
+    keywords: List[str],
+    output,
+    compare,
+    **farm_params,
+):
+    click.echo("Generating farm...", err=True)
+    make_farm(Path(farm), **farm_params)
+    context = Context(Path(farm), latency=latency, concurrency=concurrency)
+    with context.exit_stack:
+        results = {
+            "version": git_describe(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "git": git.Git().version(),
+            "farm": farm_params,
+            "latency": latency,
+            "concurrency": concurrency,
+            "benchmarks": {},
+        }
+        for name in BENCHMARKS:
+            if keywords and not any(keyword in name for keyword in keywords):
+                continue
+            click.echo(f"Running {name}...", err=True)
+            results["benchmarks"][name] = run_benchmark(name, context, repeat)
+    json.dump(results, output, indent=2)
+    output.write("\n")
+    if compare:
+        print_comparison(json.load(compare), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-__version__ = None
+def __getattr__(name: str):
+    # looked up lazily, since importing package metadata slows down every CLI's startup
+    if name == "__version__":
+        from importlib.metadata import PackageNotFoundError, version
 
-try:
-    import pkg_resources
-
-    __version__ = pkg_resources.get_distribution("git-utils").version
-except Exception:
-    pass
+        try:
+            return version("git-utils")
+        except PackageNotFoundError:
+            return None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,311 @@
+from contextlib import nullcontext
+from datetime import datetime
+from typing import (
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TYPE_CHECKING,
+    Tuple,
+)
+import logging
+import re
+import urllib.parse
+
+from git import Git, GitCommandError, Repo
+
+from ..mirrors import MirrorCache
+from ..repo import remotes_urls, TemporaryRepo
+from ..diskusage import objects_size
+from ..util import normalize_url, alias_url
+
+if TYPE_CHECKING:
+    import botocore.client
+
+logger = logging.getLogger(__name__)
+
+# maximum number of names per batch_get_repositories request
+BATCH_SIZE = 25
+# maximum number of refspecs per git fetch/push command, to stay well within the
+# limit on the length of command lines (ARG_MAX)
+REFSPECS_BATCH_SIZE = 1000
+
+
+def is_codecommit_url(urlstring: str) -> bool:
+    split_result = urllib.parse.urlsplit(normalize_url(urlstring))
+    hostname = split_result.hostname
+    return re.match(r"^git-codecommit\.[-0-9a-z]+\.amazonaws\.com$", hostname)
+
+
+def get_or_create_repository(
+    client: "botocore.client.CodeCommit",
+    name: str,
+    description: str = None,
+    tags: dict = None,
+) -> dict:
+    """
+    Get or create CodeCommit repository identified by `name`.
+
+    `description` and `tags` are only used during creation.
+    """
+    # botocore is slow to import, and already loaded if there's a client
+    from botocore.exceptions import ClientError
+
+    try:
+        return client.get_repository(repositoryName=name)
+    except ClientError as exc:
+        if exc.response.get("Error").get("Code") != "RepositoryDoesNotExistException":
+            # IDK but it's looking bad
+            raise
+        # otherwise, fine, we'll just create it
+        return client.create_repository(
+            repositoryName=name, repositoryDescription=description, tags=tags
+        )
+
+
+def is_up_to_date(tags: dict, min_updated: str) -> bool:
+    """
+    Check whether the "updated" tag's value (if any) is at or after `min_updated`.
+    """
+    updated = tags.get("updated", "1970-01-01")
+    if updated >= min_updated:
+        logger.debug("Last updated on %r; not updating", updated)
+        return True
+    return False
+
+
+def push_mirror(
+    url: str,
+    clone_url: str,
+    cache: Optional[MirrorCache] = None,
+    network: ContextManager = nullcontext(),
+    disk: ContextManager = nullcontext(),
+):
+    """
+    Clone git repo at `url` (or update its mirror in `cache`) and push it to
+    `clone_url`.
+
+    The clone is made while holding `disk`, and kept until the push is done; the
+    transfers themselves are each made while holding `network` (e.g., semaphores, to
+    limit how many clones are on disk, or transferring, at once).
+    """
+    with disk:
+        with network:
+            repo = TemporaryRepo.clone_from(url, cache=cache)
+        with repo:
+            if logger.isEnabledFor(logging.DEBUG):
+                total_size = objects_size(repo)
+                logger.debug("Cloned repo with %s bytes of objects", f"{total_size:,}")
+            logger.info("Pushing %r -> %r", url, clone_url)
+            with network:
+                repo.git.push("--mirror", clone_url)
+
+
+def ls_remote_refs(url: str) -> Dict[str, str]:
+    """
+    Get the branches and tags (not peeled) of the remote repo at `url`, as a mapping
+    from ref name to SHA.
+    """
+    output = Git().ls_remote("--heads", "--tags", "--refs", url)
+    return {
+        refname: objectname
+        for objectname, refname in (line.split("\t") for line in output.splitlines())
+    }
+
+
+def diff_refs(
+    source_refs: Dict[str, str], destination_refs: Dict[str, str]
+) -> List[str]:
+    """
+    Get the refspecs to push to make `destination_refs` match `source_refs`
+    (forcibly updating refs that differ, and deleting refs that aren't in the source).
+    """
+    refspecs = [
+        f"+{refname}:{refname}"
+        for refname, objectname in sorted(source_refs.items())
+        if destination_refs.get(refname) != objectname
+    ]
+    refspecs.extend(
+        f":{refname}"
+        for refname in sorted(destination_refs)
+        if refname not in source_refs
+    )
+    return refspecs
+
+
+def push_refs(
+    url: str,
+    clone_url: str,
+    refspecs: List[str],
+    cache: Optional[MirrorCache] = None,
+    network: ContextManager = nullcontext(),
+    disk: ContextManager = nullcontext(),
+):
+    """
+    Push only the refs in `refspecs` (see `diff_refs`) from the git repo at `url` to
+    `clone_url`, fetching just those refs into a temporary repo first (or updating
+    the repo's mirror in `cache`, if supplied). See `push_mirror` for `network` and
+    `disk`. Refspecs are fetched and pushed `REFSPECS_BATCH_SIZE` at a time.
+    """
+    fetch_refspecs = [refspec for refspec in refspecs if not refspec.startswith(":")]
+    with disk:
+        if cache:
+            with network:
+                repo = TemporaryRepo.clone_from(url, cache=cache)
+        else:
+            repo = TemporaryRepo.create()
+            with network:
+                for start in range(0, len(fetch_refspecs), REFSPECS_BATCH_SIZE):
+                    batch = fetch_refspecs[start : start + REFSPECS_BATCH_SIZE]
+                    repo.git.fetch("--no-tags", url, *batch)
+        with repo:
+            logger.info("Pushing %d ref(s) %r -> %r", len(refspecs), url, clone_url)
+            with network:
+                for start in range(0, len(refspecs), REFSPECS_BATCH_SIZE):
+                    batch = refspecs[start : start + REFSPECS_BATCH_SIZE]
+                    repo.git.push(clone_url, *batch)
+
+
+def mark_updated(client: "botocore.client.CodeCommit", resourceArn: str):
+    """
+    Set "updated" tag to the current timestamp.
+    """
+    client.tag_resource(
+        resourceArn=resourceArn,
+        tags={"updated": datetime.now().astimezone().isoformat(timespec="seconds")},
+    )
+
+
+def mirror(
+    client: "botocore.client.CodeCommit",
+    url: str,
+    name: str,
+    min_updated: str = "2050-01-01",
+    cache: Optional[MirrorCache] = None,
+    incremental: bool = True,
+):
+    """
+    Mirror git repo at `url` to existing or new CodeCommit repository.
+
+    If `incremental` is True, compares the branches and tags of both repos (with `git
+    ls-remote`) and stops if they all match, or else pushes just the refs that differ.
+    If that's not possible (or `incremental` is False), falls back to checking
+    whether such a CodeCommit repository already exists and its "updated" tag's value
+    is after `min_updated`, and if so, stops; otherwise, clones and pushes everything.
+
+    If `cache` is supplied, updates (or creates) a persistent mirror in that cache
+    rather than cloning from scratch into a temporary directory.
+
+    See `bulk.mirror_all` for mirroring many repos at once.
+    """
+    metadata = get_or_create_repository(
+        client, name, alias_url(url), {"group": "mirror", "source": url}
+    ).get("repositoryMetadata")
+    resourceArn = metadata["Arn"]
+    if incremental:
+        try:
+            refspecs = diff_refs(
+                ls_remote_refs(url), ls_remote_refs(metadata["cloneUrlSsh"])
+            )
+        except GitCommandError as exc:
+            logger.warning(
+                "Cannot compare refs; falling back to 'updated' tag: %s", exc
+            )
+        else:
+            if not refspecs:
+                logger.debug("All refs match; not updating")
+                return
+            push_refs(url, metadata["cloneUrlSsh"], refspecs, cache)
+            mark_updated(client, resourceArn)
+            return
+    # compare "updated" tag with `min_updated` value
+    tags = client.list_tags_for_resource(resourceArn=resourceArn).get("tags")
+    if is_up_to_date(tags, min_updated):
+        return
+    # ok, update
+    push_mirror(url, metadata["cloneUrlSsh"], cache)
+    mark_updated(client, resourceArn)
+
+
+def archive(
+    client: "botocore.client.CodeCommit",
+    repo: Repo,
+    name: str,
+):
+    """
+    Archive git.Repo `repo` to existing or new CodeCommit repository.
+
+    Adds resulting CodeCommit (SSH) URL to `repo`'s remotes.
+    """
+    # throw if there's more than one non-CodeCommit remote
+    (url,) = (url for url in remotes_urls(repo) if not is_codecommit_url(url))
+    metadata = get_or_create_repository(
+        client, name, alias_url(url), {"group": "archive", "source": url}
+    ).get("repositoryMetadata")
+    # push from local Repo
+    cloneUrlSsh = metadata["cloneUrlSsh"]
+    logger.info("Pushing %r -> %r", repo, cloneUrlSsh)
+    repo.git.push("--mirror", cloneUrlSsh)
+    # add new remote
+    repo.create_remote("aws", cloneUrlSsh)
+    # update "updated" tag, even though we don't read from it
+    mark_updated(client, metadata["Arn"])
+
+
+def iter_repositories(client: "botocore.client.CodeCommit", **kwargs) -> Iterator[dict]:
+    """
+    Iterate over all repositories (through multiple pages if needed).
+    """
+    while True:
+        response = client.list_repositories(**kwargs)
+        yield from response["repositories"]
+        if not (nextToken := response.get("nextToken")):
+            break
+        kwargs |= {"nextToken": nextToken}
+
+
+def iter_tags_for_resource(
+    client: "botocore.client.CodeCommit", resourceArn: str, **kwargs
+) -> Iterator[tuple[str, str]]:
+    """
+    Iterate over all tags (through multiple pages if needed).
+    """
+    while True:
+        response = client.list_tags_for_resource(resourceArn=resourceArn, **kwargs)
+        yield from response["tags"].items()
+        if not (nextToken := response.get("nextToken")):
+            break
+        kwargs |= {"nextToken": nextToken}
+
+
+def batch_get_repositories(
+    client: "botocore.client.CodeCommit", names: Iterable[str]
+) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Get metadata for many repositories by name, 25 (the most allowed) per request;
+    return metadata keyed by name, and the names of repositories that don't exist.
+    """
+    found = {}
+    not_found = []
+    names = list(names)
+    for start in range(0, len(names), BATCH_SIZE):
+        response = client.batch_get_repositories(
+            repositoryNames=names[start : start + BATCH_SIZE]
+        )
+        for metadata in response["repositories"]:
+            found[metadata["repositoryName"]] = metadata
+        not_found.extend(response["repositoriesNotFound"])
+    return found, not_found
+
+
+def get_metadata_and_tags(client: "botocore.client.CodeCommit", name: str) -> dict:
+    """
+    Get metadata and tags for a single repository by name.
+
+    See `inventory.get_inventory` for getting many at once.
+    """
+    metadata = client.get_repository(repositoryName=name).get("repositoryMetadata")
+    tags = dict(iter_tags_for_resource(client, metadata["Arn"]))
+    return metadata | {"tags": tags}
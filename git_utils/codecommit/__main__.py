@@ -0,0 +1,162 @@
+from datetime import datetime
+from typing import List, Optional, TYPE_CHECKING, TextIO
+import json
+import logging
+
+import click
+
+from ..tracing import profile_option
+from ..util import autoname
+
+if TYPE_CHECKING:
+    import botocore.client
+
+
+@click.group(help="Manage AWS CodeCommit repositories")
+@click.version_option(package_name="git-utils")
+@click.option("--region", help="AWS region (default: from AWS config/environment)")
+@profile_option
+@click.option(
+    "-v", "--verbose", count=True, help="Log extra information (repeat for even more)."
+)
+@click.pass_context
+def cli(ctx: click.Context, region: Optional[str], verbose: int):
+    logging.basicConfig(level=logging.WARNING - (verbose * 10))
+    ctx.ensure_object(dict)
+    ctx.obj["region"] = region
+
+
+def create_client(ctx: click.Context) -> "botocore.client.CodeCommit":
+    # boto3 is slow to import, so only import it when needed
+    import boto3
+
+    return boto3.client("codecommit", region_name=ctx.obj["region"])
+
+
+@cli.command()
+@click.argument("urls", nargs=-1)
+@click.option(
+    "-i",
+    "--input",
+    "input_file",
+    type=click.File(),
+    help="Read URLs from FILE ('-' for stdin), one per line, each optionally "
+    "followed by whitespace and the name to use for its CodeCommit repository.",
+)
+@click.option("-j", "--jobs", default=8, show_default=True, help="Worker threads.")
+@click.option(
+    "--network-jobs",
+    default=4,
+    show_default=True,
+    help="Maximum concurrent clones/pushes.",
+)
+@click.option(
+    "--disk-jobs",
+    default=2,
+    show_default=True,
+    help="Maximum clones on disk at once.",
+)
+@click.option(
+    "--incremental/--no-incremental",
+    default=True,
+    show_default=True,
+    help="Compare refs (with git ls-remote) and push only the ones that differ.",
+)
+@click.option(
+    "--min-updated",
+    default="2050-01-01",
+    show_default=True,
+    help="Skip repositories with an 'updated' tag at or after this timestamp "
+    "(if not --incremental, or comparing refs fails).",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    show_default=True,
+    help="Keep persistent mirrors in $GIT_UTILS_MIRROR_CACHE.",
+)
+@click.pass_context
+def mirror(
+    ctx: click.Context,
+    urls: List[str],
+    input_file: Optional[TextIO],
+    jobs: int,
+    network_jobs: int,
+    disk_jobs: int,
+    incremental: bool,
+    min_updated: str,
+    cache: bool,
+):
+    """
+    Mirror git repositories at URLS to CodeCommit repositories, named after each URL
+    (e.g., github.com/owner/repo -> owner--repo).
+    """
+    from ..mirrors import MirrorCache
+    from .bulk import mirror_all
+
+    names = {}
+    urls = list(urls)
+    for line in input_file or ():
+        if parts := line.split():
+            urls.append(parts[0])
+            if len(parts) > 1:
+                names[parts[0]] = parts[1]
+    mirror_cache = None
+    if cache and (mirror_cache := MirrorCache.from_env()) is None:
+        raise click.UsageError("--cache requires $GIT_UTILS_MIRROR_CACHE")
+    counts = {}
+    for result in mirror_all(
+        create_client(ctx),
+        urls,
+        namer=lambda url: names.get(url) or autoname(url),
+        min_updated=min_updated,
+        cache=mirror_cache,
+        jobs=jobs,
+        network_jobs=network_jobs,
+        disk_jobs=disk_jobs,
+        incremental=incremental,
+    ):
+        counts[result.status] = counts.get(result.status, 0) + 1
+        line = f"{result.status:<8} {result.seconds:8.1f}s {result.name} {result.url}"
+        if result.error:
+            line += click.style(f" {result.error}", fg="red")
+        click.echo(line)
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    click.echo(f"Done: {summary or 'nothing to do'}", err=True)
+    if counts.get("failed"):
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument("names", nargs=-1)
+@click.option("-j", "--jobs", default=8, show_default=True, help="Worker threads.")
+@click.option(
+    "--ttl",
+    default=3600,
+    show_default=True,
+    help="Seconds to reuse the cached inventory of all repositories for.",
+)
+@click.option("--refresh", is_flag=True, help="Ignore the cached inventory.")
+@click.pass_context
+def inventory(ctx: click.Context, names: List[str], jobs: int, ttl: int, refresh: bool):
+    """
+    Print metadata and tags of repositories NAMES (default: all of them, which are
+    cached) as JSON, one repository per line.
+    """
+    from .inventory import get_inventory, InventoryCache
+
+    client = create_client(ctx)
+    if names:
+        repositories = get_inventory(client, names, jobs=jobs)
+    else:
+        cache = InventoryCache(client.meta.region_name, ttl=0 if refresh else ttl)
+        repositories = cache.get(client, jobs=jobs)
+    for metadata in repositories:
+        click.echo(json.dumps(metadata, default=datetime.isoformat))
+
+
+main = cli.main
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TYPE_CHECKING,
+)
+import logging
+import threading
+import time
+
+from git import GitCommandError
+
+from ..mirrors import MirrorCache
+from ..util import alias_url, autoname
+from . import (
+    batch_get_repositories,
+    diff_refs,
+    get_or_create_repository,
+    is_up_to_date,
+    iter_tags_for_resource,
+    ls_remote_refs,
+    mark_updated,
+    push_mirror,
+    push_refs,
+)
+
+if TYPE_CHECKING:
+    import botocore.client
+
+logger = logging.getLogger(__name__)
+
+
+class MirrorResult(NamedTuple):
+    url: str
+    name: str
+    # "created", "updated", "skipped" (already up to date), or "failed"
+    status: str
+    seconds: float
+    error: Optional[str] = None
+
+
+def failed(url: str, name: str, started: float, exc: Exception) -> MirrorResult:
+    logger.error("Failed to mirror %r to %r: %s", url, name, exc)
+    seconds = time.perf_counter() - started
+    return MirrorResult(url, name, "failed", seconds, str(exc))
+
+
+def mirror_all(
+    client: "botocore.client.CodeCommit",
+    urls: Iterable[str],
+    namer: Callable[[str], str] = autoname,
+    min_updated: str = "2050-01-01",
+    cache: Optional[MirrorCache] = None,
+    jobs: int = 8,
+    network_jobs: int = 4,
+    disk_jobs: int = 2,
+    incremental: bool = True,
+) -> Iterator[MirrorResult]:
+    """
+    Mirror many git repos to CodeCommit (like `mirror` does one at a time), naming
+    each CodeCommit repository `namer(url)`, and yield a result for each repo as soon
+    as it's done. Failures are reported as results rather than raised.
+
+    First, the metadata of all existing repositories is looked up in batches. Then
+    (concurrently) their refs are compared with their sources' (if `incremental`;
+    see `mirror`), or else their "updated" tags are checked, so that up-to-date
+    repos are skipped before any cloning starts. The remaining repos are then created
+    (if needed), fetched, and pushed by a pool of `jobs` workers, with at most
+    `network_jobs` transfers and at most `disk_jobs` clones on disk at any time.
+    """
+    named_urls = []
+    names = set()
+    for url in urls:
+        started = time.perf_counter()
+        try:
+            name = namer(url)
+        except Exception as exc:  # pylint: disable=broad-except
+            yield failed(url, "", started, exc)
+            continue
+        if name in names:
+            yield failed(url, name, started, ValueError("Duplicate name"))
+            continue
+        named_urls.append((url, name))
+        names.add(name)
+    found, _ = batch_get_repositories(client, [name for _, name in named_urls])
+    network = threading.BoundedSemaphore(network_jobs)
+    disk = threading.BoundedSemaphore(disk_jobs)
+
+    # refspecs to push for repos whose refs have been compared
+    outdated_refspecs: Dict[str, List[str]] = {}
+
+    def check(url: str, name: str) -> Optional[MirrorResult]:
+        """
+        Return result if the repo is already up to date (or checking it failed).
+        """
+        started = time.perf_counter()
+        if incremental:
+            try:
+                with network:
+                    source_refs = ls_remote_refs(url)
+                    destination_refs = ls_remote_refs(found[name]["cloneUrlSsh"])
+            except GitCommandError as exc:
+                logger.warning("Cannot compare refs of %r; checking tags: %s", url, exc)
+            else:
+                if refspecs := diff_refs(source_refs, destination_refs):
+                    outdated_refspecs[name] = refspecs
+                    return None
+                seconds = time.perf_counter() - started
+                return MirrorResult(url, name, "skipped", seconds)
+        try:
+            tags = dict(iter_tags_for_resource(client, found[name]["Arn"]))
+        except Exception as exc:  # pylint: disable=broad-except
+            return failed(url, name, started, exc)
+        if is_up_to_date(tags, min_updated):
+            return MirrorResult(url, name, "skipped", time.perf_counter() - started)
+        return None
+
+    def update(url: str, name: str) -> MirrorResult:
+        started = time.perf_counter()
+        status = "updated"
+        try:
+            if (metadata := found.get(name)) is None:
+                status = "created"
+                metadata = get_or_create_repository(
+                    client, name, alias_url(url), {"group": "mirror", "source": url}
+                )["repositoryMetadata"]
+            clone_url = metadata["cloneUrlSsh"]
+            if (refspecs := outdated_refspecs.get(name)) is not None:
+                push_refs(url, clone_url, refspecs, cache, network, disk)
+            else:
+                push_mirror(url, clone_url, cache, network, disk)
+            mark_updated(client, metadata["Arn"])
+        except Exception as exc:  # pylint: disable=broad-except
+            return failed(url, name, started, exc)
+        return MirrorResult(url, name, status, time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(check, url, name): (url, name)
+            for url, name in named_urls
+            if name in found
+        }
+        outdated = [(url, name) for url, name in named_urls if name not in found]
+        for future in as_completed(futures):
+            if result := future.result():
+                yield result
+            else:
+                outdated.append(futures[future])
+        futures = [executor.submit(update, url, name) for url, name in outdated]
+        for future in as_completed(futures):
+            yield future.result()
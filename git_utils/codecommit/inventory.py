@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, TYPE_CHECKING
+import json
+import logging
+import os
+import time
+
+from ..util import cache_path, imap
+from . import batch_get_repositories, iter_repositories, iter_tags_for_resource
+
+if TYPE_CHECKING:
+    import botocore.client
+
+logger = logging.getLogger(__name__)
+
+# metadata values that botocore returns as datetimes
+DATETIME_KEYS = ("creationDate", "lastModifiedDate")
+
+
+def get_inventory(
+    client: "botocore.client.CodeCommit",
+    names: Optional[Iterable[str]] = None,
+    jobs: int = 8,
+) -> List[dict]:
+    """
+    Get metadata and tags (like `get_metadata_and_tags`) for the repositories named
+    `names` (default: all of them), ordered by name.
+
+    Metadata is looked up with `batch_get_repositories` (25 names per request), and
+    tags are listed concurrently by `jobs` threads. Names of repositories that don't
+    exist are skipped.
+    """
+    if names is None:
+        names = (
+            repository["repositoryName"] for repository in iter_repositories(client)
+        )
+    found, not_found = batch_get_repositories(client, sorted(names))
+    if not_found:
+        logger.warning("Repositories not found: %s", ", ".join(not_found))
+    repositories = [found[name] for name in sorted(found)]
+
+    def get_tags(metadata: dict) -> dict:
+        return dict(iter_tags_for_resource(client, metadata["Arn"]))
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return [
+            metadata | {"tags": tags}
+            for metadata, tags in zip(
+                repositories, imap(executor, get_tags, repositories)
+            )
+        ]
+
+
+class InventoryCache:
+    """
+    Inventory of all repositories in a region (see `get_inventory`), persisted to disk
+    for `ttl` seconds.
+    """
+
+    def __init__(self, region: str, path: Optional[Path] = None, ttl: float = 3600):
+        self.path = path or cache_path("codecommit", f"{region}.json")
+        self.ttl = ttl
+
+    def load(self) -> Optional[List[dict]]:
+        """
+        Return cached inventory, or None if there is none or it has expired.
+        """
+        try:
+            with self.path.open() as fp:
+                data = json.load(fp)
+        except (FileNotFoundError, ValueError) as exc:
+            logger.debug("No cached inventory: %s", exc)
+            return None
+        if time.time() - data["created"] > self.ttl:
+            logger.debug("Cached inventory has expired")
+            return None
+        inventory = data["inventory"]
+        for metadata in inventory:
+            for key in DATETIME_KEYS:
+                if key in metadata:
+                    metadata[key] = datetime.fromisoformat(metadata[key])
+        return inventory
+
+    def save(self, inventory: List[dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        with temporary_path.open("w") as fp:
+            data = {"created": time.time(), "inventory": inventory}
+            json.dump(data, fp, default=datetime.isoformat)
+        os.replace(temporary_path, self.path)
+
+    def get(self, client: "botocore.client.CodeCommit", jobs: int = 8) -> List[dict]:
+        """
+        Return cached inventory if it hasn't expired, otherwise get and cache it.
+        """
+        if (inventory := self.load()) is None:
+            inventory = get_inventory(client, jobs=jobs)
+            self.save(inventory)
+        return inventory
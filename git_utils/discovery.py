@@ -0,0 +1,179 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# directories that are expensive to list and (practically) never contain repos
+DEFAULT_SKIP = frozenset(
+    {
+        ".cache",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".tox",
+        ".venv",
+        "__pycache__",
+        "node_modules",
+        "site-packages",
+    }
+)
+
+# marker entries of a bare repository (in addition to the HEAD file)
+BARE_MARKERS = ("objects", "refs")
+
+
+def is_git_dir(path: str) -> bool:
+    """
+    Check whether `path` is a working tree (with a .git directory or .git file,
+    as used by worktrees and submodules) or a bare repository, using only stat calls.
+    """
+    return os.path.lexists(os.path.join(path, ".git")) or (
+        os.path.isfile(os.path.join(path, "HEAD"))
+        and all(os.path.isdir(os.path.join(path, name)) for name in BARE_MARKERS)
+    )
+
+
+class Walker:
+    """
+    Find git repositories below `top`, listing each directory exactly once with
+    `os.scandir` and reusing the DirEntry type information to decide what to descend
+    into. Directory listings are read in parallel by a pool of `jobs` threads.
+
+    Like `repo.find`, stops descending when a repository is found or when `maxdepth`
+    is reached (`maxdepth=None` means no limit); repositories shallower than `mindepth`
+    are not reported (but are not descended into, either). Directories whose name is
+    in `skip` are ignored entirely. Symbolic links to directories are followed only if
+    `follow_symlinks` is True, in which case each directory is visited at most once
+    (which also prevents symlink loops).
+    """
+
+    def __init__(
+        self,
+        maxdepth: Optional[int] = 1,
+        mindepth: int = 0,
+        skip: Iterable[str] = DEFAULT_SKIP,
+        follow_symlinks: bool = True,
+        jobs: Optional[int] = None,
+    ):
+        self.maxdepth = maxdepth
+        self.mindepth = mindepth
+        self.skip = frozenset(skip)
+        self.follow_symlinks = follow_symlinks
+        self.jobs = jobs or min(32, (os.cpu_count() or 1) * 4)
+        self.visited: Set[Tuple[int, int]] = set()
+        self.visited_lock = threading.Lock()
+
+    def _visit(self, path: str) -> bool:
+        """
+        Record `path` as visited, returning False if it had already been visited.
+        """
+        stat_result = os.stat(path)
+        key = (stat_result.st_dev, stat_result.st_ino)
+        with self.visited_lock:
+            if key in self.visited:
+                return False
+            self.visited.add(key)
+            return True
+
+    def scan(self, path: str, depth: int) -> Tuple[bool, List[str]]:
+        """
+        Determine whether `path` is a git repository and, if it is not (and `maxdepth`
+        permits descending), list its subdirectories. Returns (is_repo, subdirectories).
+        """
+        if self.maxdepth is not None and depth >= self.maxdepth:
+            # the subdirectories would be too deep anyway, so don't bother listing
+            return is_git_dir(path), []
+        names = set()
+        subdirectories = []
+        try:
+            if self.follow_symlinks and not self._visit(path):
+                logger.debug("Skipping already-visited directory: %s", path)
+                return False, []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    names.add(entry.name)
+                    if entry.name in self.skip:
+                        continue
+                    if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                        subdirectories.append(entry.path)
+        except OSError as exc:
+            logger.debug("Cannot list directory: %s", exc)
+            return False, []
+        if ".git" in names or (
+            "HEAD" in names and is_git_dir(path)  # confirm bare repo with stat calls
+        ):
+            return True, []
+        return False, subdirectories
+
+    def iter_sorted(
+        self, top: str, sortkey: Callable[[str], Any] = str.casefold
+    ) -> Iterator[str]:
+        """
+        Iterate over repositories in depth-first pre-order, visiting siblings in order
+        of `sortkey(path)`. Subdirectories are listed ahead of time in the background,
+        so each repository is yielded as soon as the preceding ones have been.
+        """
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+
+            def visit(future: Future, path: str, depth: int) -> Iterator[str]:
+                is_repo, subdirectories = future.result()
+                if is_repo:
+                    if depth >= self.mindepth:
+                        yield path
+                    return
+                subdirectories.sort(key=sortkey)
+                futures = [
+                    executor.submit(self.scan, subdirectory, depth + 1)
+                    for subdirectory in subdirectories
+                ]
+                try:
+                    for subfuture, subdirectory in zip(futures, subdirectories):
+                        yield from visit(subfuture, subdirectory, depth + 1)
+                finally:
+                    for subfuture in futures:
+                        subfuture.cancel()
+
+            yield from visit(executor.submit(self.scan, top, 0), top, 0)
+
+    def iter_unsorted(self, top: str) -> Iterator[str]:
+        """
+        Iterate over repositories in whatever order they are found.
+        """
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            pending = {executor.submit(self.scan, top, 0): (top, 0)}
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, depth = pending.pop(future)
+                        is_repo, subdirectories = future.result()
+                        if is_repo:
+                            if depth >= self.mindepth:
+                                yield path
+                            continue
+                        for subdirectory in subdirectories:
+                            subfuture = executor.submit(
+                                self.scan, subdirectory, depth + 1
+                            )
+                            pending[subfuture] = (subdirectory, depth + 1)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def iter_repos(
+    top: str,
+    sortkey: Optional[Callable[[str], Any]] = str.casefold,
+    **kwargs,
+) -> Iterator[str]:
+    """
+    Iterate over paths of git repositories within `top`, in depth-first pre-order
+    (ordering siblings by `sortkey`), or as soon as they are found if `sortkey` is None.
+    Other keyword arguments are passed to the `Walker` constructor.
+    """
+    walker = Walker(**kwargs)
+    if sortkey is None:
+        return walker.iter_unsorted(top)
+    return walker.iter_sorted(top, sortkey)
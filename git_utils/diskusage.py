@@ -0,0 +1,113 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Tuple, Union
+import logging
+import os
+import stat
+
+from git import Repo
+
+logger = logging.getLogger(__name__)
+
+
+class DiskUsage(NamedTuple):
+    # sum of file sizes (like `du --apparent-size`)
+    apparent: int
+    # sum of blocks allocated on disk (like `du`), or apparent size if unavailable
+    allocated: int
+    # number of (distinct) inodes counted, including directories
+    inodes: int
+
+
+def scan_directory(path: str) -> Tuple[List[os.stat_result], List[str]]:
+    """
+    Stat (without following symlinks) the entries of directory `path`, returning
+    their stat results and the paths of the ones that are directories.
+    """
+    stat_results = []
+    directories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    stat_result = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    # deleted since listing (e.g., by concurrent `git gc`)
+                    continue
+                stat_results.append(stat_result)
+                if stat.S_ISDIR(stat_result.st_mode):
+                    directories.append(entry.path)
+    except (FileNotFoundError, PermissionError) as exc:
+        logger.warning("Could not scan directory: %s", exc)
+    return stat_results, directories
+
+
+def iter_stat_results(top: str, jobs: int = 1) -> Iterator[os.stat_result]:
+    """
+    Stat `top` and everything in it, scanning up to `jobs` directories at once.
+    """
+    top_stat_result = os.lstat(top)
+    yield top_stat_result
+    if not stat.S_ISDIR(top_stat_result.st_mode):
+        return
+    if jobs <= 1:
+        pending = [top]
+        while pending:
+            stat_results, directories = scan_directory(pending.pop())
+            yield from stat_results
+            pending.extend(directories)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(scan_directory, top)}
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                stat_results, directories = future.result()
+                yield from stat_results
+                futures.update(
+                    executor.submit(scan_directory, directory)
+                    for directory in directories
+                )
+
+
+def disk_usage(top: Union[str, Path], jobs: int = 1) -> DiskUsage:
+    """
+    Measure the total size of `top` and everything in it, without following symlinks
+    and counting each hard-linked file only once; see `iter_stat_results` for `jobs`.
+    """
+    apparent = allocated = inodes = 0
+    # (device, inode) of files with multiple links that have already been counted
+    linked = set()
+    for stat_result in iter_stat_results(os.fspath(top), jobs):
+        if stat_result.st_nlink > 1 and not stat.S_ISDIR(stat_result.st_mode):
+            key = (stat_result.st_dev, stat_result.st_ino)
+            if key in linked:
+                continue
+            linked.add(key)
+        apparent += stat_result.st_size
+        blocks = getattr(stat_result, "st_blocks", None)
+        allocated += stat_result.st_size if blocks is None else blocks * 512
+        inodes += 1
+    return DiskUsage(apparent, allocated, inodes)
+
+
+def count_objects(repo: Repo) -> dict:
+    """
+    Parse output of `git count-objects -v`, e.g., {"count": 12, "size": 48, ...},
+    where sizes are in KiB.
+    """
+    output = repo.git.count_objects("-v")
+    return {
+        key: int(value)
+        for key, value in (line.split(": ", 1) for line in output.splitlines())
+    }
+
+
+def objects_size(repo: Repo) -> int:
+    """
+    Get the size (in bytes) of `repo`'s object store (loose objects, packs, and
+    garbage) from `git count-objects`, which is much quicker than `disk_usage` but
+    ignores everything else, such as the working tree.
+    """
+    counts = count_objects(repo)
+    return 1024 * (counts["size"] + counts["size-pack"] + counts["size-garbage"])
@@ -1,34 +1,99 @@
+from typing import Any, Iterable, Iterator, Optional, Sequence, TYPE_CHECKING
+import codecs
 import json
 import sys
 
-from requests import Response
+from git_utils.util import (
+    compile_fields,
+    decode_json_stream,
+    delete_keys,
+    project,
+    CustomJSONEncoder,
+)
 
-from git_utils.util import delete_keys, CustomJSONEncoder
+if TYPE_CHECKING:
+    import requests
 
-from .client import Client
 
+def __getattr__(name: str):
+    # requests (used by Client) is slow to import, so only import it when needed
+    if name == "Client":
+        from .client import Client
 
-def print_response(response: Response):
+        return Client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def is_url_key(key: str) -> bool:
+    return key.endswith("url")
+
+
+def iter_text(response: "requests.Response", chunk_size: int = 2**16) -> Iterator[str]:
     """
-    Print Response instance to stdout.
+    Iterate over the body of `response` as text, decoding incrementally.
     """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")("replace")
+    for chunk in response.iter_content(chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def dumps(value: Any) -> str:
     # only pretty-print if stdout is a TTY (not piped anywhere else)
     indent = 2 if sys.stdout.isatty() else None
-    dump_kwargs = {
-        "ensure_ascii": False,
-        "cls": CustomJSONEncoder,
-        "indent": indent,
-        "sort_keys": True,
-    }
+    # (json.dumps, unlike json.dump, uses the C encoder when not indenting)
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        cls=CustomJSONEncoder,
+        indent=indent,
+        sort_keys=True,
+    )
+
+
+def print_items(items: Iterable):
+    """
+    Print each item on its own line (unless pretty-printing) to stdout.
+    """
+    for item in items:
+        sys.stdout.write(dumps(item))
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
 
-    result = response.json()
-    # remove keys ending with 'url'
-    result = delete_keys(result, lambda k: k.endswith("url"))
+def print_response(
+    response: "requests.Response",
+    stream: bool = False,
+    fields: Optional[Sequence[str]] = None,
+):
+    """
+    Print Response instance to stdout.
+
+    If `stream` is True, the response body is read and printed incrementally (it
+    should have been requested with stream=True), one item at a time if it's a list.
+
+    If `fields` is given, only those (dotted) paths are printed; otherwise, keys
+    ending with 'url' are removed.
+    """
+    tree = compile_fields(fields) if fields else None
+    if stream:
+        if tree:
+            decoder = json.JSONDecoder()
+        else:
+            # remove keys ending with 'url' while decoding
+            decoder = json.JSONDecoder(
+                object_pairs_hook=lambda pairs: {
+                    k: v for k, v in pairs if not is_url_key(k)
+                }
+            )
+        result = decode_json_stream(iter_text(response), decoder)
+    else:
+        result = response.json()
+        if not tree:
+            # remove keys ending with 'url'
+            result = delete_keys(result, is_url_key)
 
     if isinstance(result, dict):
-        json.dump(result, sys.stdout, **dump_kwargs)
+        sys.stdout.write(dumps(project(result, tree)))
     else:
-        for item in result:
-            json.dump(item, sys.stdout, **dump_kwargs)
-            sys.stdout.write("\n")
-            sys.stdout.flush()
+        print_items(project(item, tree) for item in result)
@@ -1,26 +1,73 @@
+from pathlib import Path
+from typing import List, Optional, TYPE_CHECKING
+import json
 import logging
 import os
 
 import click
 
-import git_utils
-from . import print_response
-from .client import Client
+from git_utils.tracing import profile_option
+from git_utils.util import delete_keys
+from . import is_url_key, print_items, print_response
+
+if TYPE_CHECKING:
+    from .client import Client
+
+
+def print_stats(client: "Client"):
+    for budget_stats in client.rate_limiter.stats():
+        click.echo(json.dumps(budget_stats), err=True)
 
 
 @click.group(help="Execute GitHub API requests")
-@click.version_option(git_utils.__version__)
+@click.version_option(package_name="git-utils")
 @click.option(
     "-t",
     "--token",
-    default=os.environ.get("GITHUB_TOKEN"),
-    help="API authorization token.",
+    "tokens",
+    multiple=True,
+    default=[token for token in os.environ.get("GITHUB_TOKEN", "").split(",") if token],
+    help="API authorization token (repeat to spread requests across tokens).",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Cache responses and revalidate them with conditional requests.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Directory to cache responses in (default: ~/.cache/git-utils/github).",
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="Print rate limit budget and usage of each token to stderr when done.",
 )
+@click.option(
+    "-f",
+    "--fields",
+    help="Comma-separated (dotted) paths to print, e.g., name,owner.login,pushed_at",
+)
+@profile_option
 @click.option(
     "-v", "--verbose", count=True, help="Log extra information (repeat for even more)."
 )
 @click.pass_context
-def cli(ctx: click.Context, token: str, verbose: int):
+def cli(
+    ctx: click.Context,
+    tokens: List[str],
+    cache: bool,
+    cache_dir: str,
+    stats: bool,
+    fields: Optional[str],
+    verbose: int,
+):
+    # requests (used by Client) is slow to import, so only import it when needed
+    from .cache import ResponseCache
+    from .client import Client
+
     level = logging.WARNING - (verbose * 10)
     # (none) = 0 => 30 = WARNING
     # -v     = 1 => 20 = INFO
@@ -29,20 +76,31 @@ def cli(ctx: click.Context, token: str, verbose: int):
     logging.basicConfig(level=level)
     logger = logging.getLogger("github-api")
     logger.debug("Logging at level %d", level)
-    if token:
-        client = Client.from_token(token)
+    if tokens:
+        client = Client.from_token(*tokens)
     else:
         logger.warning("Could not find token; continuing without authentication.")
         client = Client()
+    if cache:
+        client.cache = ResponseCache(Path(cache_dir) if cache_dir else None)
+    if stats:
+        ctx.call_on_close(lambda: print_stats(client))
     # pass along API instance to subcommands:
     ctx.ensure_object(dict)
     ctx.obj["client"] = client
+    ctx.obj["fields"] = fields.split(",") if fields else None
 
 
 @cli.command()
 @click.argument("path")
+@click.option(
+    "-s",
+    "--stream",
+    is_flag=True,
+    help="Read and print the response incrementally (bypassing the cache).",
+)
 @click.pass_context
-def path(ctx: click.Context, path: str):
+def path(ctx: click.Context, path: str, stream: bool):
     """
     Perform GitHub API request and print the response.
 
@@ -50,7 +108,8 @@ def path(ctx: click.Context, path: str):
     """
     # TODO: figure out how to make this the default action
     # (where it runs if none of the other subcommands match)
-    print_response(ctx.obj["client"].request(path))
+    with ctx.obj["client"].request(path, stream=stream) as response:
+        print_response(response, stream=stream, fields=ctx.obj["fields"])
 
 
 @cli.command()
@@ -60,10 +119,10 @@ def path(ctx: click.Context, path: str):
 @click.option("-r", "--repo", required=True, help="repository name")
 @click.pass_context
 def commits(ctx: click.Context, owner: str, repo: str):
-    client: Client = ctx.obj["client"]
+    client: "Client" = ctx.obj["client"]
     url = f"/repos/{owner}/{repo}/commits"
     for response in client.iter_first_and_last_responses(url):
-        print_response(response)
+        print_response(response, fields=ctx.obj["fields"])
 
 
 @cli.command()
@@ -73,10 +132,10 @@ def commits(ctx: click.Context, owner: str, repo: str):
 @click.option("-r", "--repo", required=True, help="repository name")
 @click.pass_context
 def watchers(ctx: click.Context, owner: str, repo: str):
-    client: Client = ctx.obj["client"]
+    client: "Client" = ctx.obj["client"]
     url = f"/repos/{owner}/{repo}/subscribers"
     for response in client.iter_first_and_last_responses(url):
-        print_response(response)
+        print_response(response, fields=ctx.obj["fields"])
 
 
 @cli.command()
@@ -87,10 +146,34 @@ def watchers(ctx: click.Context, owner: str, repo: str):
 @click.option("-p", "--path", help="path in repository to list contents of", default="")
 @click.pass_context
 def contents(ctx: click.Context, owner: str, repo: str, path: str):
-    client: Client = ctx.obj["client"]
+    client: "Client" = ctx.obj["client"]
     url = f"/repos/{owner}/{repo}/contents/{path}"
     for response in client.iter_first_and_last_responses(url):
-        print_response(response)
+        print_response(response, fields=ctx.obj["fields"])
+
+
+@cli.command()
+@click.option("-o", "--owner", help="user/organization (default: authenticated user)")
+@click.option(
+    "-g",
+    "--graphql",
+    is_flag=True,
+    help="Request only the given --fields, via the GraphQL API (requires a token).",
+)
+@click.pass_context
+def repos(ctx: click.Context, owner: Optional[str], graphql: bool):
+    """
+    List repositories of user/organization.
+    """
+    client: "Client" = ctx.obj["client"]
+    fields = ctx.obj["fields"]
+    if graphql:
+        print_items(client.iter_graphql_repos(owner, fields=fields or ("name",)))
+    else:
+        items = client.iter_repos(username=owner, fields=fields)
+        if not fields:
+            items = (delete_keys(item, is_url_key) for item in items)
+        print_items(items)
 
 
 main = cli.main
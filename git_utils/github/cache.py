@@ -0,0 +1,153 @@
+from pathlib import Path
+from typing import Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+
+from ..util import cache_path
+
+logger = logging.getLogger(__name__)
+
+# headers that describe the (already decoded) body as originally transferred
+TRANSFER_HEADERS = ("Content-Encoding", "Content-Length", "Transfer-Encoding")
+
+
+class ResponseCache:
+    """
+    On-disk cache of GitHub API responses which have an ETag and/or Last-Modified
+    header, for sending conditional requests; GitHub does not count requests that
+    result in '304 Not Modified' against the rate limit.
+
+    Each entry is stored as two files, `{key}.json` (metadata) and `{key}.body`.
+    Once their total size exceeds `max_bytes`, the least recently used entries
+    are deleted.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = 100 * 2**20):
+        self.path = path or cache_path("github")
+        self.max_bytes = max_bytes
+        self.total_size: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def key(self, url: str, params: Optional[dict], authorization: str) -> str:
+        """
+        Hash request URL and params, separating entries by `authorization`, since
+        responses can differ depending on who is asking.
+        """
+        params = sorted(
+            (key, str(value))
+            for key, value in (params or {}).items()
+            if value is not None
+        )
+        data = json.dumps([url, params, authorization])
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def load(self, key: str) -> Optional[dict]:
+        """
+        Read cached metadata (with "url", "status_code", "headers", and "encoding").
+        """
+        try:
+            with (self.path / f"{key}.json").open() as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, metadata: dict) -> dict:
+        headers = {}
+        if etag := metadata["headers"].get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := metadata["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def revive(
+        self, key: str, metadata: dict, not_modified: requests.Response
+    ) -> Optional[requests.Response]:
+        """
+        Recreate the cached response, updated with the headers of the
+        '304 Not Modified' response (e.g., current rate limits).
+        """
+        body_path = self.path / f"{key}.body"
+        try:
+            content = body_path.read_bytes()
+            # mark as recently used
+            os.utime(body_path)
+        except OSError:
+            return None
+        response = requests.Response()
+        response.status_code = metadata["status_code"]
+        response.reason = "OK"
+        response.url = metadata["url"]
+        response.encoding = metadata["encoding"]
+        response.headers.update(metadata["headers"])
+        response.headers.update(
+            (name, value)
+            for name, value in not_modified.headers.items()
+            if name not in TRANSFER_HEADERS
+        )
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response.from_cache = True
+        response._content = content  # pylint: disable=protected-access
+        return response
+
+    def store(self, key: str, response: requests.Response):
+        if not ("ETag" in response.headers or "Last-Modified" in response.headers):
+            return
+        metadata = {
+            "url": response.url,
+            "status_code": response.status_code,
+            "encoding": response.encoding,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name not in TRANSFER_HEADERS
+            },
+        }
+        self.path.mkdir(parents=True, exist_ok=True)
+        size = 0
+        for suffix, data in (
+            (".body", response.content),
+            (".json", json.dumps(metadata).encode()),
+        ):
+            path = self.path / f"{key}{suffix}"
+            temporary_path = path.with_name(f"{path.name}.{threading.get_ident()}")
+            temporary_path.write_bytes(data)
+            os.replace(temporary_path, path)
+            size += len(data)
+        with self.lock:
+            if self.total_size is None:
+                self.total_size = self._measure()
+            else:
+                self.total_size += size
+            if self.total_size > self.max_bytes:
+                self._evict()
+
+    def _measure(self) -> int:
+        return sum(path.stat().st_size for path in self.path.iterdir())
+
+    def _evict(self):
+        """
+        Delete least recently used entries until total size is within max_bytes.
+        """
+        entries = []
+        for body_path in self.path.glob("*.body"):
+            metadata_path = body_path.with_suffix(".json")
+            try:
+                body_stat = body_path.stat()
+                size = body_stat.st_size + metadata_path.stat().st_size
+            except OSError:
+                continue
+            entries.append((body_stat.st_mtime, size, body_path, metadata_path))
+        self.total_size = sum(size for _, size, _, _ in entries)
+        for _, size, body_path, metadata_path in sorted(entries):
+            if self.total_size <= self.max_bytes:
+                break
+            logger.debug("Evicting cached response %s", body_path.stem)
+            metadata_path.unlink(missing_ok=True)
+            body_path.unlink(missing_ok=True)
+            self.total_size -= size
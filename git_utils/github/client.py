@@ -1,19 +1,78 @@
-from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+import itertools
 import logging
 import os
 import urllib
 
 import requests
 
+from .. import tracing
+from ..util import compile_fields, imap, project
+from .cache import ResponseCache
+from .graphql import (
+    GraphQLError,
+    REPOSITORIES_QUERY,
+    VIEWER_REPOSITORIES_QUERY,
+    selection,
+)
+from .ratelimit import RateLimiter, resource_for_path
+
 logger = logging.getLogger(__name__)
 
 
+def parse_links(response: requests.Response) -> Dict[str, str]:
+    """
+    Parse Link header of `response` into mapping from "rel" to URL.
+    """
+    link_header = response.headers.get("Link", "")
+    return {
+        link["rel"]: link["url"]
+        for link in requests.utils.parse_header_links(link_header)
+    }
+
+
+def iter_page_urls(last_url: str) -> Optional[Iterator[str]]:
+    """
+    Given the URL of the last page of a page-based listing, iterate over the URLs of
+    all the pages after the first, or return None if `last_url` has no page parameter
+    (e.g., if it uses cursor-based pagination instead).
+    """
+    split_result = urllib.parse.urlsplit(last_url)
+    query = urllib.parse.parse_qsl(split_result.query)
+    last_page = next((int(value) for key, value in query if key == "page"), None)
+    if last_page is None:
+        return None
+    return (
+        urllib.parse.urlunsplit(
+            split_result._replace(
+                query=urllib.parse.urlencode(
+                    [(key, page if key == "page" else value) for key, value in query]
+                )
+            )
+        )
+        for page in range(2, last_page + 1)
+    )
+
+
 class Client:
-    def __init__(self):
+    def __init__(
+        self,
+        concurrency: int = 4,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
         self.scheme = "https"
         self.netloc = "api.github.com"
+        self.concurrency = concurrency
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
         self.session = requests.Session()
         self.session.headers["Accept"] = "application/vnd.github.v3+json"
+        # allow as many pooled connections as concurrent requests
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, concurrency))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     @classmethod
     def from_env(
@@ -27,10 +86,15 @@ class Client:
         return client
 
     @classmethod
-    def from_token(cls, token: str):
+    def from_token(cls, *tokens: str):
+        """
+        Create client that authenticates with the given token(s); each request uses
+        whichever token has the most remaining rate limit budget.
+        """
         client = cls()
-        client.session.headers["Authorization"] = f"token {token}"
-        logger.debug("Authenticating with token: ...%s", token[-8:])
+        client.rate_limiter.authorizations = [f"token {token}" for token in tokens]
+        for token in tokens:
+            logger.debug("Authenticating with token: ...%s", token[-8:])
         return client
 
     def request(self, url: str, method: str = "GET", **kwargs) -> requests.Response:
@@ -43,17 +107,86 @@ class Client:
             (scheme or self.scheme, netloc or self.netloc, path, None, fragment)
         )
         # merge query from url with params, giving precedence to values from url
+        # (without modifying the given params, which may be shared between requests)
         if query:
-            kwargs.setdefault("params", {}).update(urllib.parse.parse_qsl(query))
+            kwargs["params"] = {
+                **(kwargs.get("params") or {}),
+                **dict(urllib.parse.parse_qsl(query)),
+            }
+        resource = resource_for_path(path)
+        for attempt in itertools.count():
+            budget = self.rate_limiter.acquire(resource)
+            with tracing.span(f"{method} {path}", "http", url=url) as span_args:
+                response = self._send(method, url, budget.authorization, **kwargs)
+                span_args |= {
+                    "params": kwargs.get("params"),
+                    "status": response.status_code,
+                    "bytes": (
+                        response.headers.get("Content-Length")
+                        if kwargs.get("stream")
+                        else len(response.content)
+                    ),
+                    "from_cache": getattr(response, "from_cache", False),
+                    "token": budget.name,
+                    "rate_limit_remaining": response.headers.get(
+                        "X-RateLimit-Remaining"
+                    ),
+                }
+            self.rate_limiter.update(budget, response)
+            delay = self.rate_limiter.retry_delay(budget, response, attempt)
+            if delay is None:
+                break
+            with tracing.span("rate limit", "sleep", seconds=delay):
+                self.rate_limiter.sleep(delay)
+        response.raise_for_status()
+        return response
+
+    def _send(
+        self, method: str, url: str, authorization: Optional[str], **kwargs
+    ) -> requests.Response:
+        """
+        Send request with given Authorization header value (if any), using the cache
+        for GET requests (unless streaming).
+        """
+        headers = kwargs.get("headers") or {}
+        if authorization:
+            headers = {"Authorization": authorization, **headers}
+        kwargs["headers"] = headers
+        # send conditional request if there's a cached response
+        cache_key = cached = None
+        if self.cache and method == "GET" and not kwargs.get("stream"):
+            authorization = authorization or self.session.headers.get(
+                "Authorization", ""
+            )
+            cache_key = self.cache.key(
+                url, kwargs.get("params"), f"{authorization}{self.session.auth!r}"
+            )
+            if cached := self.cache.load(cache_key):
+                kwargs["headers"] = {
+                    **self.cache.conditional_headers(cached),
+                    **headers,
+                }
         logger.debug("Requesting URL: %s", url)
         response = self.session.request(method, url, **kwargs)
         logger.debug("Response headers: %s", response.headers)
-        response.raise_for_status()
+        if cached and response.status_code == 304:
+            if revived := self.cache.revive(cache_key, cached, response):
+                logger.debug("Using cached response for %s", url)
+                return revived
+            # the cached body has disappeared; try again without the cache
+            kwargs["headers"] = headers
+            response = self.session.request(method, url, **kwargs)
+        if cache_key and response.ok:
+            self.cache.store(cache_key, response)
         return response
 
     def iter_responses(self, url: str, **kwargs) -> Iterator[requests.Response]:
         """
-        Iterate over paginated responses.
+        Iterate over paginated responses, in order.
+
+        If the first response links to a last page by number, the remaining pages are
+        requested concurrently (up to `self.concurrency` at a time). Otherwise (e.g.,
+        for cursor-based pagination), follows rel="next" links one at a time.
         """
         kwargs.setdefault("params", {}).setdefault("per_page", 100)
         try:
@@ -66,21 +199,63 @@ class Client:
             # re-raise all other errors
             raise
         yield response
-        link_header = response.headers.get("Link", "")
-        links = {
-            link["rel"]: link["url"]
-            for link in requests.utils.parse_header_links(link_header)
-        }
+        links = parse_links(response)
+        if self.concurrency > 1 and "last" in links:
+            if (page_urls := iter_page_urls(links["last"])) is not None:
+                with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                    yield from imap(
+                        executor,
+                        lambda page_url: self.request(page_url, **kwargs),
+                        page_urls,
+                    )
+                return
         # the last page has no rel="next" link
-        if "next" in links:
-            yield from self.iter_responses(links["next"], **kwargs)
+        while "next" in links:
+            response = self.request(links["next"], **kwargs)
+            yield response
+            links = parse_links(response)
 
-    def iter_items(self, url: str, **kwargs) -> Iterator:
+    def iter_items(
+        self, url: str, fields: Optional[Sequence[str]] = None, **kwargs
+    ) -> Iterator:
         """
         Assuming each response is a JSON list.
+
+        If `fields` is given, each item is reduced to just those (dotted) paths.
         """
+        tree = compile_fields(fields) if fields else None
         for response in self.iter_responses(url, **kwargs):
-            yield from response.json()
+            for item in response.json():
+                yield project(item, tree)
+
+    def graphql(self, query: str, **variables) -> dict:
+        """
+        Perform GitHub GraphQL API query, returning the "data" of the response.
+        """
+        response = self.request(
+            "/graphql", method="POST", json={"query": query, "variables": variables}
+        )
+        result = response.json()
+        if errors := result.get("errors"):
+            raise GraphQLError(errors)
+        return result["data"]
+
+    def iter_graphql_nodes(
+        self, query: str, path: Sequence[str], **variables
+    ) -> Iterator[dict]:
+        """
+        Iterate over the nodes of the connection at `path` in the result of `query`,
+        which must take a `$cursor` variable and select the connection's pageInfo.
+        """
+        cursor = None
+        while True:
+            connection = self.graphql(query, cursor=cursor, **variables)
+            for key in path:
+                connection = connection[key]
+            yield from connection["nodes"]
+            if not connection["pageInfo"]["hasNextPage"]:
+                break
+            cursor = connection["pageInfo"]["endCursor"]
 
     def iter_first_and_last_responses(
         self, url: str, **kwargs
@@ -88,11 +263,7 @@ class Client:
         kwargs.setdefault("params", {}).setdefault("per_page", 100)
         response = self.request(url, **kwargs)
         yield response
-        link_header = response.headers.get("Link", "")
-        links = {
-            link["rel"]: link["url"]
-            for link in requests.utils.parse_header_links(link_header)
-        }
+        links = parse_links(response)
         # jump to last page if there are multiple pages
         if "last" in links:
             response = self.request(links["last"], **kwargs)
@@ -107,6 +278,7 @@ class Client:
         direction: str = None,  # asc | desc
         visibility: str = None,  # all | public | private
         affiliation: str = None,  # owner + collaborator + organization_member
+        fields: Optional[Sequence[str]] = None,
     ) -> Iterator[dict]:
         """
         Docs: https://docs.github.com/en/rest/reference/repos#list-repositories-for-the-authenticated-user
@@ -125,7 +297,25 @@ class Client:
             "visibility": visibility,
             "affiliation": affiliation,
         }
-        yield from self.iter_items(path, params=params)
+        yield from self.iter_items(path, params=params, fields=fields)
+
+    def iter_graphql_repos(
+        self, login: str = None, fields: Sequence[str] = ("name",)
+    ) -> Iterator[dict]:
+        """
+        Like `iter_repos`, but request only the given `fields` (REST API names, which
+        are translated into GraphQL fields, but aliased back) via the GraphQL API.
+
+        Docs: https://docs.github.com/en/graphql/reference/objects#repositoryowner
+        """
+        nodes = selection(compile_fields(fields))
+        if login:
+            query = REPOSITORIES_QUERY % nodes
+            path = ("repositoryOwner", "repositories")
+            yield from self.iter_graphql_nodes(query, path, login=login)
+        else:
+            query = VIEWER_REPOSITORIES_QUERY % nodes
+            yield from self.iter_graphql_nodes(query, ("viewer", "repositories"))
 
     def iter_commits(
         self,
@@ -136,6 +326,7 @@ class Client:
         author: str = None,
         since: str = None,
         until: str = None,
+        fields: Optional[Sequence[str]] = None,
     ) -> Iterator[dict]:
         """
         Docs: https://docs.github.com/en/rest/reference/repos#list-commits
@@ -147,49 +338,145 @@ class Client:
             "since": since,
             "until": until,
         }
-        yield from self.iter_items(f"/repos/{owner}/{repo}/commits", params=params)
+        yield from self.iter_items(
+            f"/repos/{owner}/{repo}/commits", params=params, fields=fields
+        )
 
     def iter_branches(
         self,
         owner: str,
         repo: str,
         protected: str = None,
+        fields: Optional[Sequence[str]] = None,
     ) -> Iterator[dict]:
         """
         Docs: https://docs.github.com/en/rest/reference/repos#list-branches
         """
         params = {"protected": protected}
-        yield from self.iter_items(f"/repos/{owner}/{repo}/branches", params=params)
+        yield from self.iter_items(
+            f"/repos/{owner}/{repo}/branches", params=params, fields=fields
+        )
 
     def iter_all_commits(
-        self, owner: str, repo: str, author: str = None
+        self,
+        owner: str,
+        repo: str,
+        author: str = None,
+        compare: bool = False,
+        fields: Optional[Sequence[str]] = None,
     ) -> Iterator[dict]:
         """
-        Iterate over all commits in all branches.
+        Iterate over all commits in all branches, without duplicates.
+
+        Branches are crawled concurrently, in rounds: each round requests the next page
+        of commits for every branch still in progress (up to `self.concurrency` at a
+        time), and then processes those pages in branch order, so that the output
+        doesn't depend on which requests finish first. A branch is done as soon as it
+        reaches a commit that has already been seen, which is a heuristic: commits
+        that only that branch merged in, and that are older than the seen commit, are
+        skipped.
+
+        If `compare` is True, gets all the commits in the default branch, and then only
+        the commits unique to each other branch, using the compare endpoint.
+
+        If `fields` is given, each commit is reduced to just those (dotted) paths.
         """
+        tree = compile_fields(fields) if fields else None
         branches = list(self.iter_branches(owner, repo))
         logger.debug(
             "Getting all commits from all %d branches: %s",
             len(branches),
             ", ".join(branch["name"] for branch in branches),
         )
+        branch_names = [branch["name"] for branch in branches]
+        if compare:
+            commits = self._iter_compare_commits(owner, repo, branch_names, author)
+        else:
+            commits = self._iter_frontier_commits(owner, repo, branch_names, author)
+        for commit in commits:
+            yield project(commit, tree)
+
+    def _iter_frontier_commits(
+        self, owner: str, repo: str, branch_names: List[str], author: str = None
+    ) -> Iterator[dict]:
+        """
+        Iterate over the commits in each branch, in rounds, until reaching seen ones.
+        """
+        url = f"/repos/{owner}/{repo}/commits"
+        # next page to request for each branch that hasn't reached seen history yet
+        frontier = {
+            branch_name: (url, {"sha": branch_name, "author": author, "per_page": 100})
+            for branch_name in branch_names
+        }
         seen_shas = set()
-        for branch in branches:
-            branch_name = branch["name"]
-            for commit in self.iter_commits(
-                owner, repo, sha=branch_name, author=author
-            ):
-                sha = commit["sha"]
-                # since we're always iterating upward through the tree, from HEAD to the initial commit,
-                # I think (?) we can assume that if we run into a SHA we've already seen,
-                # continuing along that path will only retrace our steps from a previous branch
-                # (But idk, maybe there's some weird merge functionality that might void that guarantee?)
-                if sha in seen_shas:
-                    logger.debug(
-                        "Breaking out of branch %r early (already seen %r)",
-                        branch_name,
-                        sha,
-                    )
-                    break
-                seen_shas.add(sha)
-                yield commit
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while frontier:
+                responses = imap(
+                    executor,
+                    lambda page: self.request(page[0], params=page[1]),
+                    frontier.values(),
+                )
+                next_frontier = {}
+                for branch_name, response in zip(frontier, responses):
+                    for commit in response.json():
+                        sha = commit["sha"]
+                        # the commits after a seen one are mostly its ancestors, which
+                        # the branch it was seen in lists (or has listed) itself; but
+                        # pages are in date order, not topological order, so commits
+                        # merged in from elsewhere that are older than it can be missed
+                        # (compare=True doesn't have this problem)
+                        if sha in seen_shas:
+                            logger.debug(
+                                "Breaking out of branch %r early (already seen %r)",
+                                branch_name,
+                                sha,
+                            )
+                            break
+                        seen_shas.add(sha)
+                        yield commit
+                    else:
+                        if next_url := parse_links(response).get("next"):
+                            next_frontier[branch_name] = (next_url, None)
+                frontier = next_frontier
+
+    def _iter_compare_commits(
+        self, owner: str, repo: str, branch_names: List[str], author: str = None
+    ) -> Iterator[dict]:
+        """
+        Iterate over all commits in the default branch, followed by the commits in
+        each other branch that aren't in the default branch (newest first).
+        """
+        default_branch = self.request(f"/repos/{owner}/{repo}").json()["default_branch"]
+        seen_shas = set()
+        for commit in self.iter_commits(owner, repo, sha=default_branch, author=author):
+            seen_shas.add(commit["sha"])
+            yield commit
+
+        def get_unique_commits(branch_name: str) -> List[dict]:
+            basehead = "...".join(
+                urllib.parse.quote(name) for name in (default_branch, branch_name)
+            )
+            url = f"/repos/{owner}/{repo}/compare/{basehead}"
+            commits = [
+                commit
+                for response in self.iter_responses(url)
+                for commit in response.json()["commits"]
+            ]
+            # the compare endpoint lists commits oldest first
+            return commits[::-1]
+
+        other_branch_names = [name for name in branch_names if name != default_branch]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for commits in imap(executor, get_unique_commits, other_branch_names):
+                for commit in commits:
+                    # branches may share commits that aren't in the default branch
+                    if commit["sha"] in seen_shas:
+                        continue
+                    seen_shas.add(commit["sha"])
+                    # unlike the commits endpoint, the compare endpoint can't filter
+                    # by author
+                    if author is None or author in (
+                        (commit.get("author") or {}).get("login"),
+                        commit["commit"]["author"]["email"],
+                    ):
+                        yield commit
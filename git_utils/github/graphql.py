@@ -0,0 +1,60 @@
+from typing import Optional
+
+# GraphQL names of REST API fields that aren't simply camelCase versions
+RENAMES = {
+    "archived": "isArchived",
+    "fork": "isFork",
+    "forks_count": "forkCount",
+    "full_name": "nameWithOwner",
+    "html_url": "url",
+    "private": "isPrivate",
+    "stargazers_count": "stargazerCount",
+}
+
+REPOSITORIES_QUERY = """
+query($login: String!, $cursor: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}
+"""
+
+VIEWER_REPOSITORIES_QUERY = """
+query($cursor: String) {
+  viewer {
+    repositories(first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    def __init__(self, errors: list):
+        super().__init__("; ".join(error.get("message", "") for error in errors))
+        self.errors = errors
+
+
+def camel_case(name: str) -> str:
+    first, *rest = name.split("_")
+    return first + "".join(part[:1].upper() + part[1:] for part in rest)
+
+
+def selection(tree: Optional[dict]) -> str:
+    """
+    Render field tree (see `util.compile_fields`) as a GraphQL selection set, using
+    aliases so that the response has the same keys as the REST API would.
+    """
+    fields = []
+    for key, subtree in (tree or {}).items():
+        name = RENAMES.get(key) or camel_case(key)
+        field = name if name == key else f"{key}: {name}"
+        if subtree is not None:
+            field += f" {{ {selection(subtree)} }}"
+        fields.append(field)
+    return " ".join(fields)
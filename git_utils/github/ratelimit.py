@@ -0,0 +1,193 @@
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def resource_for_path(path: str) -> str:
+    """
+    Guess which rate limit resource (see https://docs.github.com/en/rest/rate-limit)
+    a request to `path` counts against.
+    """
+    if path.startswith("/search/"):
+        return "search"
+    if path.startswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+def parse_retry_after(value: Optional[str], now: float) -> Optional[float]:
+    """
+    Parse Retry-After header `value`, which is either a number of seconds or an
+    HTTP date (RFC 9110), into the number of seconds to wait after `now` (a
+    timestamp), or None if it's missing or neither.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - now)
+
+
+class Budget:
+    """
+    Rate limit state of a single credential for a single resource, as of the last
+    response, plus counters of what the RateLimiter has done with it.
+    """
+
+    def __init__(self, authorization: Optional[str], resource: str):
+        self.authorization = authorization
+        self.resource = resource
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None
+        self.requests = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def name(self) -> str:
+        # never reveal more than the end of a token
+        return f"...{self.authorization[-4:]}" if self.authorization else "(default)"
+
+    def stats(self) -> dict:
+        return {
+            "token": self.name,
+            "resource": self.resource,
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset": self.reset,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class RateLimiter:
+    """
+    Schedule requests across one or more credentials (Authorization header values;
+    None means whatever the session provides), based on the X-RateLimit-* headers
+    of their responses:
+    * each request uses the credential with the most remaining budget
+    * once a credential's remaining budget drops below the `reserve` fraction of its
+      limit, requests are spread out evenly over the time until the budget resets,
+      rather than exhausting it
+    * when a credential is exhausted, waits until it resets (or switches credentials)
+    * secondary rate limits are retried after Retry-After seconds, or after an
+      exponentially increasing delay (starting at one minute) if not specified
+    """
+
+    def __init__(
+        self,
+        authorizations: Iterable[Optional[str]] = (None,),
+        reserve: float = 0.02,
+        max_retries: int = 5,
+    ):
+        self.authorizations = list(authorizations)
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.budgets: Dict[Tuple[Optional[str], str], Budget] = {}
+        self.lock = threading.Lock()
+        # replaceable for testing
+        self.clock = time.time
+        self.sleep = time.sleep
+
+    def _budget(self, authorization: Optional[str], resource: str) -> Budget:
+        key = (authorization, resource)
+        if key not in self.budgets:
+            self.budgets[key] = Budget(authorization, resource)
+        return self.budgets[key]
+
+    def acquire(self, resource: str = "core") -> Budget:
+        """
+        Pick the credential with the most remaining budget for `resource`, waiting
+        first if that budget is (nearly) exhausted.
+        """
+        with self.lock:
+            budgets = [
+                self._budget(authorization, resource)
+                for authorization in self.authorizations
+            ]
+            # prefer credentials we don't know anything about yet
+            budget = max(
+                budgets,
+                key=lambda budget: (
+                    float("inf") if budget.remaining is None else budget.remaining
+                ),
+            )
+            budget.requests += 1
+            delay = 0.0
+            now = self.clock()
+            if budget.remaining is not None:
+                if budget.reset and budget.reset > now:
+                    if budget.remaining <= 0:
+                        delay = budget.reset - now + 1
+                    elif budget.remaining < (budget.limit or 0) * self.reserve:
+                        delay = (budget.reset - now) / budget.remaining
+                # count this request until its response says otherwise
+                budget.remaining -= 1
+        if delay:
+            logger.info(
+                "Waiting %.1fs for %s rate limit of %s", delay, resource, budget.name
+            )
+            budget.throttled_seconds += delay
+            self.sleep(delay)
+        return budget
+
+    def update(self, budget: Budget, response: requests.Response):
+        """
+        Update `budget` from the rate limit headers of `response`.
+        """
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        resource = headers.get("X-RateLimit-Resource", budget.resource)
+        with self.lock:
+            budget = self._budget(budget.authorization, resource)
+            budget.limit = int(headers.get("X-RateLimit-Limit", 0)) or None
+            budget.remaining = int(headers["X-RateLimit-Remaining"])
+            budget.reset = float(headers.get("X-RateLimit-Reset", 0)) or None
+
+    def retry_delay(
+        self, budget: Budget, response: requests.Response, attempt: int
+    ) -> Optional[float]:
+        """
+        Determine how long to wait before retrying `response`, or None if it is not a
+        rate limit error (or if it has already been retried `max_retries` times).
+        """
+        if response.status_code not in (403, 429) or attempt >= self.max_retries:
+            return None
+        delay = parse_retry_after(response.headers.get("Retry-After"), self.clock())
+        if delay is None:
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                # primary rate limit: acquire will wait for the reset, or switch tokens
+                delay = 0.0
+            elif "rate limit" in response.text.lower():
+                # secondary rate limit without (valid) Retry-After
+                delay = 60.0 * 2**attempt
+            else:
+                return None
+        budget.retries += 1
+        budget.throttled_seconds += delay
+        logger.warning(
+            "Rate limited (%d); retrying in %.1fs with %s",
+            response.status_code,
+            delay,
+            budget.name,
+        )
+        return delay
+
+    def stats(self) -> List[dict]:
+        with self.lock:
+            return [budget.stats() for budget in self.budgets.values()]
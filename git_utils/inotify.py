@@ -0,0 +1,119 @@
+from typing import List, NamedTuple, Union
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+
+# event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# any change to a directory's entries, or to the files in it
+IN_CHANGES = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+# flags for inotify_init1 (same as O_NONBLOCK and O_CLOEXEC)
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event {int wd; uint32_t mask, cookie, len; char name[];}
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Event(NamedTuple):
+    wd: int
+    mask: int
+    cookie: int
+    # name of the file within the watched directory (empty for the directory itself)
+    name: str
+
+
+def parse_events(data: bytes) -> List[Event]:
+    events = []
+    offset = 0
+    while offset < len(data):
+        wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+        offset += EVENT_HEADER.size
+        name = data[offset : offset + length].rstrip(b"\0")
+        offset += length
+        events.append(Event(wd, mask, cookie, os.fsdecode(name)))
+    return events
+
+
+class Inotify:
+    """
+    Minimal non-blocking wrapper around Linux's inotify API (via ctypes), for use with
+    `select` or `selectors`. Raises OSError if inotify is not available.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init1 = libc.inotify_init1
+        except AttributeError as exc:
+            raise OSError(errno.ENOSYS, "inotify is not available") from exc
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def add_watch(self, path: Union[str, os.PathLike], mask: int = IN_CHANGES) -> int:
+        """
+        Watch `path` for events in `mask`, returning the watch descriptor (which is
+        the same for every call with the same path).
+        """
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), os.fspath(path))
+        return wd
+
+    def remove_watch(self, wd: int):
+        self._rm_watch(self.fd, wd)
+
+    def read(self, size: int = 2**16) -> List[Event]:
+        """
+        Read events that are ready (if any), without blocking.
+        """
+        try:
+            data = os.read(self.fd, size)
+        except BlockingIOError:
+            return []
+        return parse_events(data)
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self) -> "Inotify":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,176 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+from git import Repo
+
+from .diskusage import objects_size
+from .util import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# only branches and tags are mirrored; `git clone --mirror` would fetch every ref,
+# including hosting-specific ones like GitHub's refs/pull/*, which shouldn't be pushed
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+@contextmanager
+def locked(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold an exclusive advisory lock (flock) on the file at `path` (creating it if
+    needed) for the duration of the context, which produces True. If `blocking` is
+    False and the lock is held elsewhere, produces False (without locking) instead.
+
+    The file is deleted (while still locked) once done; anyone who opened it before
+    then notices that it was replaced once they acquire the lock, and tries again.
+    """
+    while True:
+        with path.open("a") as fp:
+            try:
+                fcntl.flock(fp, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                if os.stat(path).st_ino != os.fstat(fp.fileno()).st_ino:
+                    continue
+            except FileNotFoundError:
+                continue
+            try:
+                yield True
+            finally:
+                path.unlink()
+                fcntl.flock(fp, fcntl.LOCK_UN)
+            return
+
+
+def create_mirror(url: str, path: Path) -> Repo:
+    """
+    Create a bare repository at `path` that mirrors the branches and tags of `url`.
+    """
+    repo = Repo.init(path, bare=True)
+    repo.git.remote("add", "origin", url)
+    repo.git.config("remote.origin.fetch", MIRROR_REFSPECS[0], replace_all=True)
+    repo.git.config("remote.origin.fetch", MIRROR_REFSPECS[1], add=True)
+    repo.git.fetch("origin")
+    return repo
+
+
+class MirrorCache:
+    """
+    Directory of bare mirrors of the branches and tags of remote repositories (see
+    `create_mirror`), keyed on normalized URL.
+
+    A cached mirror is refreshed with `git fetch --prune` instead of being cloned
+    again. Once the total size of all mirrors exceeds `max_bytes`, the least recently
+    used mirrors (that are not currently in use) are deleted.
+
+    Mirrors are locked (with flock) while in use, so that multiple processes can
+    safely share the same cache directory.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(
+        cls,
+        path_var: str = "GIT_UTILS_MIRROR_CACHE",
+        max_bytes_var: str = "GIT_UTILS_MIRROR_CACHE_MAX_BYTES",
+    ) -> Optional["MirrorCache"]:
+        """
+        Create cache from environment variables, if configured (otherwise, None).
+        """
+        if path := os.getenv(path_var):
+            max_bytes = os.getenv(max_bytes_var)
+            return cls(path, int(max_bytes) if max_bytes else None)
+        return None
+
+    def key(self, url: str) -> str:
+        """
+        Generate filesystem-safe name for the mirror of `url`.
+        """
+        url = normalize_url(url)
+        digest = hashlib.sha256(url.encode()).hexdigest()[:16]
+        # add the tail of the URL to make the cache directory easier to browse
+        tail = re.sub(r"[^-.\w]+", "-", url.rstrip("/").rsplit("/", 1)[-1])
+        return f"{digest}-{tail.removesuffix('.git')}"
+
+    def _metadata_path(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    @staticmethod
+    def _has_refspecs(mirror_path: Path) -> bool:
+        with Repo(mirror_path) as repo:
+            with repo.config_reader("repository") as config:
+                refspecs = config.get_values('remote "origin"', "fetch", "")
+        return refspecs == MIRROR_REFSPECS
+
+    @contextmanager
+    def mirror(self, url: str) -> Iterator[Repo]:
+        """
+        Lock, create or update, and provide the mirror of `url` as a (bare) Repo.
+        Evicts other mirrors as needed once done.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        key = self.key(url)
+        mirror_path = self.path / f"{key}.git"
+        with locked(self.path / f"{key}.lock"):
+            if mirror_path.exists() and self._has_refspecs(mirror_path):
+                logger.debug("Updating cached mirror of %r at %s", url, mirror_path)
+                repo = Repo(mirror_path)
+                repo.git.fetch("--prune", "origin")
+            else:
+                logger.debug("Cloning mirror of %r into %s", url, mirror_path)
+                # mirrors made with `git clone --mirror` may contain refs outside
+                # MIRROR_REFSPECS, which `fetch --prune` wouldn't delete
+                shutil.rmtree(mirror_path, ignore_errors=True)
+                repo = create_mirror(url, mirror_path)
+            with self._metadata_path(key).open("w") as fp:
+                metadata = {
+                    "url": url,
+                    "size": objects_size(repo),
+                    "used": time.time(),
+                }
+                json.dump(metadata, fp)
+            with repo:
+                yield repo
+        self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used mirrors until their total size is within max_bytes.
+        Mirrors that are currently locked are skipped.
+        """
+        if self.max_bytes is None:
+            return
+        entries = []
+        for metadata_path in self.path.glob("*.json"):
+            try:
+                with metadata_path.open() as fp:
+                    metadata = json.load(fp)
+            except (OSError, ValueError) as exc:
+                logger.debug("Ignoring unreadable mirror metadata: %s", exc)
+                continue
+            entries.append((metadata["used"], metadata["size"], metadata_path.stem))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            with locked(self.path / f"{key}.lock", blocking=False) as acquired:
+                if not acquired:
+                    logger.debug("Not evicting mirror %s, which is in use", key)
+                    continue
+                logger.info("Evicting mirror %s (%s bytes)", key, f"{size:,}")
+                shutil.rmtree(self.path / f"{key}.git", ignore_errors=True)
+                self._metadata_path(key).unlink()
+            total_size -= size
@@ -0,0 +1,92 @@
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import json
+import logging
+import os
+
+from ..util import cache_path
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteTags(NamedTuple):
+    repository: str
+    # (commit, tag) pairs, in the order listed by the remote
+    tags: List[Tuple[str, str]]
+    error: Optional[str] = None
+
+
+def expand_repository(repository: str, default_scheme: str, default_host: str) -> str:
+    """
+    Add scheme and host to `repository` if it doesn't have them (e.g., the path part
+    of a URL, like "chbrown/amulet"). file:// URLs are returned unchanged.
+    """
+    split_result = urlsplit(repository)
+    if split_result.scheme == "file":
+        return repository
+    split_result = split_result._replace(
+        scheme=split_result.scheme or default_scheme,
+        netloc=split_result.netloc or default_host,
+    )
+    return urlunsplit(split_result)
+
+
+def iter_remote_tags(
+    repositories: Iterable[str], jobs: int = 8, patterns: Iterable[str] = ()
+) -> Iterator[RemoteTags]:
+    """
+    Run `ls_remote_tags` (with `patterns`) on each of `repositories` with a pool of
+    `jobs` threads, yielding results as soon as they arrive (not necessarily in
+    order). Failures are reported as results rather than raised.
+    """
+    # GitPython is slow to import, so only import it when needed
+    from ..repo import ls_remote_tags
+
+    def get(repository: str) -> RemoteTags:
+        try:
+            return RemoteTags(repository, list(ls_remote_tags(repository, *patterns)))
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Failed to list tags of %r: %s", repository, exc)
+            return RemoteTags(repository, [], str(exc))
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(get, repository) for repository in repositories]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class TagCache:
+    """
+    Persistent mapping from repository to the tags (and their commits) last seen there.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or cache_path("remote-tags.json")
+        self.entries: Dict[str, Dict[str, str]] = {}
+
+    def load(self) -> "TagCache":
+        try:
+            with self.path.open() as fp:
+                self.entries = json.load(fp)
+        except (FileNotFoundError, ValueError) as exc:
+            logger.debug("Starting with empty tag cache: %s", exc)
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        with temporary_path.open("w") as fp:
+            json.dump(self.entries, fp)
+        os.replace(temporary_path, self.path)
+
+    def update(self, repository: str, tags: List[Tuple[str, str]]) -> bool:
+        """
+        Record `tags` for `repository`, returning whether they differ from the tags
+        seen last time (which is always the case for a repository not seen before).
+        """
+        current = {tag: commit for commit, tag in tags}
+        previous = self.entries.get(repository)
+        self.entries[repository] = current
+        return current != previous
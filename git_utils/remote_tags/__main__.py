@@ -1,32 +1,96 @@
-from urllib.parse import urlsplit, urlunsplit
+from typing import List, Optional, TextIO
 
 import click
 
-import git_utils
-from ..repo import ls_remote_tags
+from ..tracing import profile_option
+from . import expand_repository, iter_remote_tags, TagCache
 
 
 @click.command()
-@click.version_option(git_utils.__version__)
-@click.argument("repository")
+@click.version_option(package_name="git-utils")
+@click.argument("repositories", nargs=-1)
+@click.option(
+    "-i",
+    "--input",
+    "input_file",
+    type=click.File(),
+    help="Read more repositories from FILE ('-' for stdin), one per line.",
+)
 @click.option("-s", "--default-scheme", default="git", show_default=True)
 @click.option("-h", "--default-host", default="github.com", show_default=True)
-def cli(repository: str, default_scheme: str, default_host: str):
+@click.option(
+    "-j", "--jobs", default=8, show_default=True, help="Repositories to query at once."
+)
+@click.option(
+    "-p",
+    "--pattern",
+    "patterns",
+    multiple=True,
+    help="Only list tags matching this pattern, e.g., 'v1.*' (repeatable).",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    show_default=True,
+    help="Record the tags seen in each repository (in the git-utils cache directory).",
+)
+@click.option(
+    "--changed-only",
+    is_flag=True,
+    help="Only print the tags of repositories whose tags have changed since they "
+    "were last recorded (implies --cache).",
+)
+@profile_option
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    repositories: List[str],
+    input_file: Optional[TextIO],
+    default_scheme: str,
+    default_host: str,
+    jobs: int,
+    patterns: List[str],
+    cache: bool,
+    changed_only: bool,
+):
     """
     git-ls-remote --tags without the fluff.
 
-    REPOSITORY can be a URL, the path part of a URL (in which case the scheme and
-    host are added from the --default-{scheme,host} options), or filepath.
+    Each of REPOSITORIES can be a URL, the path part of a URL (in which case the
+    scheme and host are added from the --default-{scheme,host} options), or filepath.
+
+    Given a single repository, prints its tags; otherwise, queries the repositories
+    concurrently and prints "REPOSITORY<TAB>TAG" lines as each one responds.
     """
-    split_result = urlsplit(repository)
-    split_result = split_result._replace(
-        scheme=split_result.scheme or default_scheme,
-        netloc=split_result.netloc or default_host,
-    )
-    repository = urlunsplit(split_result)
-
-    for _, tag in ls_remote_tags(repository):
-        print(tag)
+    repositories = list(repositories)
+    repositories.extend(line.strip() for line in input_file or () if line.strip())
+    if not repositories:
+        raise click.UsageError("No repositories given")
+    tag_cache = TagCache().load() if cache or changed_only else None
+    failures = 0
+    for result in iter_remote_tags(
+        (
+            expand_repository(repository, default_scheme, default_host)
+            for repository in repositories
+        ),
+        jobs=jobs,
+        patterns=patterns,
+    ):
+        if result.error:
+            failures += 1
+            click.echo(f"{result.repository}: {result.error}", err=True)
+            continue
+        changed = (
+            tag_cache.update(result.repository, result.tags) if tag_cache else True
+        )
+        if changed_only and not changed:
+            continue
+        for _, tag in result.tags:
+            click.echo(tag if len(repositories) == 1 else f"{result.repository}\t{tag}")
+    if tag_cache:
+        tag_cache.save()
+    if failures:
+        ctx.exit(1)
 
 
 main = cli.main
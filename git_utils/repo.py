@@ -1,10 +1,30 @@
+from contextlib import ExitStack
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+import logging
+import os
 
-from git import Git, Commit, Head, Repo
+from git import Git, GitCommandError, Commit, Head, Repo
 
-from .util import LazySet
+from .discovery import iter_repos
+from .mirrors import MirrorCache
+from .util import BinshaSet, LazySet
+
+logger = logging.getLogger(__name__)
 
 
 def find(
@@ -16,12 +36,13 @@ def find(
     Find git dirs via depth-first pre-order filesystem traversal.
     Stops descending when a git dir is found or when maxdepth is reached.
     E.g., maxdepth=1 searches children of `path` but no further.
+
+    See `discovery.iter_repos` for a faster (and optionally unordered) alternative.
     """
-    if (path / ".git").exists():
-        yield path
-    elif maxdepth > 0:
-        for child in sorted(path.iterdir(), key=sortkey):
-            yield from find(child, maxdepth - 1, sortkey)
+    for git_dir in iter_repos(
+        str(path), sortkey=lambda child: sortkey(Path(child)), maxdepth=maxdepth
+    ):
+        yield Path(git_dir)
 
 
 def remotes_urls(repo: Repo) -> Set[str]:
@@ -29,9 +50,32 @@ def remotes_urls(repo: Repo) -> Set[str]:
     return {url for remote in repo.remotes for url in remote.urls}
 
 
+def iter_rev_list_binshas(repo: Repo, *args: str) -> Iterator[bytes]:
+    """
+    Run `git rev-list <args>...` and iterate over the binshas of the listed commits,
+    streaming its output without creating any Commit objects.
+    """
+    process = repo.git.rev_list(*args, as_process=True)
+    for line in process.stdout:
+        yield bytes.fromhex(line.decode("ascii").rstrip())
+    process.wait()
+
+
+def iter_heads_binshas(repo: Repo) -> Iterator[bytes]:
+    """
+    Iterate over the binshas of all commits in all heads, each exactly once.
+
+    Runs a single `git rev-list --branches` process, which walks shared history only
+    once and uses the commit-graph file, if there is one (unless core.commitGraph is
+    disabled).
+    """
+    return iter_rev_list_binshas(repo, "--branches")
+
+
 def heads_commits(repo: Repo) -> Set[Commit]:
     """Get all Commits in all heads"""
-    return {commit for head in repo.heads for commit in repo.iter_commits(head)}
+    # Commit objects are only read from the object database when their data is needed
+    return {Commit(repo, binsha) for binsha in iter_heads_binshas(repo)}
 
 
 def heads_off_remote(repo: Repo) -> List[Head]:
@@ -62,6 +106,142 @@ def status(repo: Repo, branch: bool = False) -> List[Tuple[str, str]]:
     ]
 
 
+def iter_nul_fields(stream: BinaryIO, chunk_size: int = 2**16) -> Iterator[str]:
+    """
+    Read NUL-terminated fields from binary `stream` (e.g., the output of a git command
+    run with -z) as they arrive, decoding each one as UTF-8.
+    """
+    remainder = b""
+    while chunk := stream.read(chunk_size):
+        *fields, remainder = (remainder + chunk).split(b"\0")
+        for field in fields:
+            yield field.decode(errors="surrogateescape")
+    if remainder:
+        yield remainder.decode(errors="surrogateescape")
+
+
+def iter_status_v2(fields: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Parse the NUL-separated `fields` of `git status --porcelain=v2 -z` output lazily,
+    yielding (XY, path) tuples resembling v1 output: unchanged is " " rather than
+    ".", untracked and ignored are "??" and "!!", and renames/copies are formatted as
+    "origPath -> path". Headers are yielded as ("#", "<name> <value>") tuples.
+    """
+    fields = iter(fields)
+    for field in fields:
+        if not field:
+            continue
+        kind = field[0]
+        if kind == "#":
+            yield "#", field[2:]
+        elif kind == "1":
+            _, xy, *_, path = field.split(" ", 8)
+            yield xy.replace(".", " "), path
+        elif kind == "2":
+            _, xy, *_, path = field.split(" ", 9)
+            # the original path of a rename/copy is the following NUL-terminated field
+            yield xy.replace(".", " "), f"{next(fields)} -> {path}"
+        elif kind == "u":
+            _, xy, *_, path = field.split(" ", 10)
+            yield xy, path
+        elif kind in "?!":
+            yield kind * 2, field[2:]
+        else:
+            raise ValueError(f"Encountered unrecognized status entry: {field!r}")
+
+
+def parse_status_v2(output: str) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+    """
+    Parse the output of `git status --porcelain=v2 -z [--branch] [--show-stash]` into
+    (headers, entries), where `headers` maps header names like "branch.head" or "stash"
+    to their values, and `entries` is a list of (XY, path) tuples (see
+    `iter_status_v2`).
+    """
+    headers = {}
+    entries = []
+    for xy, path in iter_status_v2(output.split("\0")):
+        if xy == "#":
+            key, _, value = path.partition(" ")
+            headers[key] = value
+        else:
+            entries.append((xy, path))
+    return headers, entries
+
+
+class StatusV2(NamedTuple):
+    headers: Dict[str, str]
+    # (XY, path) tuples, up to the maximum number requested
+    entries: List[Tuple[str, str]]
+    # number of entries with each XY, including any beyond the maximum
+    counts: Dict[str, int]
+
+
+def status_v2(
+    repo: Repo,
+    max_entries: Optional[int] = None,
+    untracked_files: Optional[str] = None,
+) -> StatusV2:
+    """
+    Run `git status --porcelain=v2 --branch --show-stash -z` and parse its output as
+    it's read (see `iter_status_v2`); the headers include branch name, upstream,
+    ahead/behind counts, and stash count.
+
+    Only the first `max_entries` entries (if not None) are kept; the rest are just
+    counted, so all of git's output is still read (but not stored).
+
+    `untracked_files` ("no", "normal", or "all") is passed to git as --untracked-files
+    (e.g., "normal" lists untracked directories rather than every file in them); by
+    default, git's status.showUntrackedFiles config applies.
+    """
+    options = {"untracked_files": untracked_files} if untracked_files else {}
+    process = repo.git.status(
+        porcelain="v2", branch=True, show_stash=True, z=True, as_process=True, **options
+    )
+    headers = {}
+    entries = []
+    counts = {}
+    for xy, path in iter_status_v2(iter_nul_fields(process.stdout)):
+        if xy == "#":
+            key, _, value = path.partition(" ")
+            headers[key] = value
+            continue
+        counts[xy] = counts.get(xy, 0) + 1
+        if max_entries is None or len(entries) < max_entries:
+            entries.append((xy, path))
+    process.wait()
+    return StatusV2(headers, entries, counts)
+
+
+def for_each_ref(repo: Repo, *patterns: str) -> List[Tuple[str, str]]:
+    """
+    Run `git for-each-ref [<pattern>...]` and return a list of (objectname, refname)
+    tuples, without loading any objects.
+    """
+    output = repo.git.for_each_ref(*patterns, format="%(objectname) %(refname)")
+    return [tuple(line.split(" ", 1)) for line in output.splitlines()]
+
+
+def has_object(repo: Repo, hexsha: str) -> bool:
+    """
+    Check whether object `hexsha` exists in `repo`'s object database
+    (using GitPython's persistent `git cat-file --batch-check` process).
+    """
+    try:
+        repo.git.get_object_header(hexsha)
+        return True
+    except ValueError:
+        return False
+
+
+def ls_remote_heads(repo: Repo, url: str) -> List[str]:
+    """
+    Get the hexshas of all heads in remote `url`, via `git ls-remote --heads`.
+    """
+    return [
+        line.split()[0] for line in repo.git.ls_remote(url, heads=True).splitlines()
+    ]
+
+
 def info_lines(
     repo: Repo, ignore_names: Iterable[str] = ("refs",)
 ) -> Iterator[Tuple[str, str]]:
@@ -80,22 +260,60 @@ def info_lines(
                         yield name, line
 
 
-def ls_remote_tags(repo: Union[Repo, str]) -> Iterator[Tuple[str, str]]:
+class RemoteTag(NamedTuple):
+    tag: str
+    # the ref's object: a commit (lightweight tag) or tag object (annotated tag)
+    objectname: str
+    # the commit an annotated tag points to (if peeled)
+    peeled: Optional[str] = None
+
+
+def iter_ls_remote_tags(
+    repo: Union[Repo, str], *patterns: str, peel: bool = False
+) -> Iterator[RemoteTag]:
     """
-    Iterate over (commit, tag) pairs from `git-ls-remote --tags`.
-    `repo` can be either an on-disk Repo or a URL.
+    Stream tags from `git ls-remote --tags [<patterns>...]`, reading its output as
+    it arrives rather than waiting for the whole list. `repo` can be either an
+    on-disk Repo (listing its default remote) or a URL.
+
+    With protocol v2 (git's default since 2.26), --tags asks the server for refs
+    under refs/tags/ only; `patterns` (e.g., "v1.*") are matched against the end of
+    each ref name by git, as in `git ls-remote`.
+
+    If `peel` is True, the peeled "<tag>^{}" entry that follows each annotated tag is
+    merged into its record; otherwise, such entries are omitted from the output.
+    Unexpected refs are logged and skipped.
     """
     git, args = (repo.git, ()) if isinstance(repo, Repo) else (Git(), (repo,))
-    lines = git.ls_remote(*args, tags=True, quiet=True).splitlines()
-    for line in lines:
-        commit, tag = line.split()
-        # discard tags that end with ^{} (what are those for?)
-        if tag.endswith("^{}"):
+    options = {"tags": True, "quiet": True, "refs": not peel}
+    process = git.ls_remote(*args, *patterns, as_process=True, **options)
+    # the most recent record, which is held back in case its peeled entry is next
+    pending: Optional[RemoteTag] = None
+    for line in process.stdout:
+        objectname, _, refname = line.decode().rstrip("\n").partition("\t")
+        if not refname.startswith("refs/tags/"):
+            logger.warning("Skipping unrecognized tag: %r", refname)
+            continue
+        tag = refname[len("refs/tags/") :]
+        if pending and tag == f"{pending.tag}^{{}}":
+            yield pending._replace(peeled=objectname)
+            pending = None
             continue
-        if not tag.startswith("refs/tags/"):
-            raise ValueError(f"Encountered unrecognized tag: {tag}")
-        tag = tag[len("refs/tags/") :]
-        yield commit, tag
+        if pending:
+            yield pending
+        pending = RemoteTag(tag, objectname)
+    if pending:
+        yield pending
+    process.wait()
+
+
+def ls_remote_tags(repo: Union[Repo, str], *patterns: str) -> Iterator[Tuple[str, str]]:
+    """
+    Iterate over (objectname, tag) pairs from `git-ls-remote --tags`; see
+    `iter_ls_remote_tags`.
+    """
+    for remote_tag in iter_ls_remote_tags(repo, *patterns):
+        yield remote_tag.objectname, remote_tag.tag
 
 
 class TemporaryRepo(Repo):
@@ -103,46 +321,162 @@ class TemporaryRepo(Repo):
     """
     Acts like a Repo but overrides `clone_from` and `close` in order to create and
     delete a temporary directory.
+
+    If a MirrorCache is supplied to `clone_from`, uses (and locks, until closed) a
+    persistent mirror from that cache instead, which is not deleted.
     """
 
     temporary_directory: Optional[TemporaryDirectory] = None
+    exit_stack: Optional[ExitStack] = None
 
     @classmethod
-    def clone_from(cls, url: str, bare: bool = True, **kwargs) -> "TemporaryRepo":
+    def clone_from(
+        cls,
+        url: str,
+        bare: bool = True,
+        cache: Optional[MirrorCache] = None,
+        **kwargs,
+    ) -> "TemporaryRepo":
+        if cache:
+            if not bare or kwargs:
+                raise ValueError(
+                    "Cached mirrors are always bare and cannot be customized"
+                )
+            exit_stack = ExitStack()
+            mirror = exit_stack.enter_context(cache.mirror(url))
+            repo = cls(mirror.git_dir)
+            repo.exit_stack = exit_stack
+            return repo
         temporary_directory = TemporaryDirectory(suffix=".git", prefix="repo-")
         repo = super().clone_from(url, temporary_directory.name, bare=bare, **kwargs)
         repo.temporary_directory = temporary_directory
         return repo
 
+    @classmethod
+    def create(cls, bare: bool = True) -> "TemporaryRepo":
+        """
+        Initialize a new, empty repo in a temporary directory.
+        """
+        temporary_directory = TemporaryDirectory(suffix=".git", prefix="repo-")
+        repo = cls.init(temporary_directory.name, bare=bare)
+        repo.temporary_directory = temporary_directory
+        return repo
+
     def close(self):
         super().close()
         if self.temporary_directory:
             self.temporary_directory.cleanup()
+        if self.exit_stack:
+            self.exit_stack.close()
 
 
-def iter_clone_commits(url: str) -> Iterator[Commit]:
+def iter_clone_commits(
+    url: str, cache: Optional[MirrorCache] = None
+) -> Iterator[Commit]:
     """
-    Clone remote to bare repo in temporary directory and iterate over all commits.
+    Clone remote to bare repo in temporary directory (or use mirror from `cache`) and
+    iterate over all commits.
 
     If clone fails for any reason, simply generates nothing.
     """
     try:
-        with TemporaryRepo.clone_from(url) as repo:
+        with TemporaryRepo.clone_from(url, cache=cache) as repo:
             yield from heads_commits(repo)
     except Exception:
         pass
 
 
-def iter_commits_not_in_remotes(repo: Repo) -> Set[Commit]:
+def iter_clone_binshas(
+    url: str, cache: Optional[MirrorCache] = None
+) -> Iterator[bytes]:
+    """
+    Clone remote to bare repo in temporary directory (or use mirror from `cache`) and
+    iterate over the binshas of all commits (like `iter_clone_commits`, but without
+    creating Commit objects).
+
+    If clone fails for any reason, simply generates nothing.
+    """
+    try:
+        with TemporaryRepo.clone_from(url, cache=cache) as repo:
+            yield from iter_heads_binshas(repo)
+    except Exception:
+        pass
+
+
+def iter_binshas_not_in_remotes(repo: Repo) -> Iterator[bytes]:
+    """
+    Iterate over the binshas of commits in any of `repo`'s heads that are not in any
+    head of any of its remotes, without cloning anything.
+
+    The remote heads are read with `git ls-remote`; if all of them are already present
+    locally, a single `git rev-list --branches --not <remote heads>` does the rest.
+    Otherwise, the remotes with unknown heads are fetched (all with a single `git fetch
+    --multiple`) into one temporary bare repo which borrows `repo`'s objects (via
+    objects/info/alternates), so that only the missing objects are transferred.
+
+    Remotes that cannot be read (e.g., due to network errors) are ignored.
     """
-    Select just the commits from the given repo not found in any remote,
-    cloning remote(s) into temporary directories as needed.
+    present_tips = []
+    missing_urls = []
+    for url in sorted(remotes_urls(repo)):
+        try:
+            tips = ls_remote_heads(repo, url)
+        except GitCommandError as exc:
+            logger.warning("Cannot list heads of remote %r: %s", url, exc)
+            continue
+        if all(has_object(repo, tip) for tip in tips):
+            present_tips.extend(tips)
+        else:
+            missing_urls.append(url)
+    if not missing_urls:
+        yield from iter_rev_list_binshas(repo, "--branches", "--not", *present_tips)
+        return
+    heads = [objectname for objectname, _ in for_each_ref(repo, "refs/heads")]
+    with TemporaryDirectory(suffix=".git", prefix="objects-") as store_dir:
+        with Repo.init(store_dir, bare=True) as store:
+            objects_dir = os.path.abspath(os.path.join(repo.common_dir, "objects"))
+            alternates_path = os.path.join(store_dir, "objects", "info", "alternates")
+            with open(alternates_path, "w") as fp:
+                fp.write(f"{objects_dir}\n")
+            names = []
+            for index, url in enumerate(missing_urls):
+                names.append(f"remote{index}")
+                store.git.remote("add", names[-1], url)
+            logger.debug("Fetching %d remote(s) into %s", len(names), store_dir)
+            try:
+                store.git.fetch("--multiple", "--no-tags", *names)
+            except GitCommandError as exc:
+                logger.warning("Cannot fetch some remote(s): %s", exc)
+            yield from iter_rev_list_binshas(
+                store, *heads, "--not", *present_tips, "--remotes"
+            )
+
+
+def iter_commits_not_in_remotes(
+    repo: Repo,
+    clone: bool = False,
+    cache: Optional[MirrorCache] = None,
+    compact: bool = False,
+) -> Set[Commit]:
+    """
+    Select just the commits from the given repo not found in any remote.
+
+    By default, uses `iter_binshas_not_in_remotes`, which only fetches objects that
+    are not already present locally. If clone=True, instead clones each remote into a
+    temporary directory (or mirrors it into `cache`) and compares all of the commits
+    in both. With clone=True, `compact` holds the remotes' commits in a BinshaSet,
+    which uses about a quarter of the memory but is slower, e.g., for remotes with
+    tens of millions of commits.
     """
-    clone_binshas = LazySet(
-        commit.binsha
+    if not clone:
+        return {Commit(repo, binsha) for binsha in iter_binshas_not_in_remotes(repo)}
+    clone_binshas = (BinshaSet if compact else LazySet)(
+        binsha
         for url in remotes_urls(repo)
-        for commit in iter_clone_commits(url)
+        for binsha in iter_clone_binshas(url, cache)
     )
     return {
-        commit for commit in heads_commits(repo) if commit.binsha not in clone_binshas
+        Commit(repo, binsha)
+        for binsha in iter_heads_binshas(repo)
+        if binsha not in clone_binshas
     }
@@ -1,42 +1,161 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
 import logging
 import os
 
 from colorama import Fore
 import click
-import git
 
-import git_utils
+from .. import tracing
+from ..discovery import iter_repos
+from ..util import imap
+from .cache import SnapshotCache
+from .daemon import Daemon, query, socket_path
 from .snapshot import create, iter_report
 
 logger = logging.getLogger(__name__)
 
 
+def report(git_dir: str, cache: Optional[SnapshotCache] = None, **options) -> List[str]:
+    """
+    Create snapshot of the git repository at `git_dir` (passing `options` to
+    `snapshot.create`) and render it as report lines.
+    """
+    # GitPython is slow to import, and not needed if the daemon has every snapshot
+    import git
+
+    with tracing.span(git_dir, "repo"):
+        try:
+            with git.Repo(git_dir) as repo:
+                if repo.bare:
+                    return [
+                        f"{Fore.LIGHTBLACK_EX}Bare git repo: {git_dir!r}{Fore.RESET}"
+                    ]
+                create_snapshot = partial(create, **options)
+                if cache:
+                    snapshot = cache.get(repo, create_snapshot, options)
+                else:
+                    snapshot = create_snapshot(repo)
+                return list(iter_report(snapshot))
+        except git.exc.InvalidGitRepositoryError:  # pylint: disable=no-member
+            return [
+                f"{Fore.LIGHTBLACK_EX}Not a valid git repo: {git_dir!r}{Fore.RESET}"
+            ]
+
+
 @click.command()
-@click.version_option(git_utils.__version__)
+@click.version_option(package_name="git-utils")
 @click.argument("git_dirs", type=click.Path(exists=True, file_okay=False), nargs=-1)
-def cli(git_dirs: List[str]):
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="Number of repositories to snapshot concurrently.",
+)
+@click.option(
+    "-d",
+    "--maxdepth",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="How deep to search for repositories when GIT_DIRS are not given.",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    show_default=True,
+    help="Reuse snapshots of repositories whose index, HEAD, refs, tracked files, and "
+    "top-level directories are unchanged (new untracked files more than one "
+    "directory deep are missed until --clear-cache).",
+)
+@click.option(
+    "--clear-cache", is_flag=True, help="Discard all cached snapshots before starting."
+)
+@click.option(
+    "-n",
+    "--max-entries",
+    type=click.IntRange(min=0),
+    help="Only list this many changed paths per repository, followed by counts of "
+    "all of them by status. This only limits what is listed: all of git's output is "
+    "still read, to count them.",
+)
+@click.option(
+    "-u",
+    "--untracked-files",
+    type=click.Choice(["no", "normal", "all"]),
+    help="Passed to git status; 'normal' lists untracked directories rather than "
+    "every file in them (default: status.showUntrackedFiles config).",
+)
+@click.option(
+    "--daemon",
+    is_flag=True,
+    help="Instead of printing statuses, keep snapshots of GIT_DIRS up to date (using "
+    "inotify) and serve them to other git-summary processes, until interrupted.",
+)
+@click.option(
+    "--use-daemon/--no-use-daemon",
+    default=True,
+    show_default=True,
+    help="Get up-to-date snapshots from the daemon, if it's running.",
+)
+@tracing.profile_option
+def cli(
+    git_dirs: List[str],
+    jobs: int,
+    maxdepth: int,
+    cache: bool,
+    clear_cache: bool,
+    max_entries: Optional[int],
+    untracked_files: Optional[str],
+    daemon: bool,
+    use_daemon: bool,
+):
     """
     Print statuses for multiple git repositories.
 
-    GIT_DIRS defaults to child directories of the current working directory.
+    GIT_DIRS defaults to the repositories found within the current working directory
+    (down to --maxdepth levels deep).
     """
     if not git_dirs:
-        git_dirs = [
-            child
-            for child in sorted(os.listdir(), key=str.casefold)
-            if os.path.isdir(child)
-        ]
+        git_dirs = (
+            os.path.relpath(git_dir)
+            for git_dir in iter_repos(os.curdir, mindepth=1, maxdepth=maxdepth)
+        )
 
-    for git_dir in git_dirs:
+    options = {"max_entries": max_entries, "untracked_files": untracked_files}
+    if daemon:
         try:
-            with git.Repo(git_dir) as repo:
-                snapshot = create(repo)
-                for line in iter_report(snapshot):
-                    print(line)
-        except git.exc.InvalidGitRepositoryError:  # pylint: disable=no-member
-            print(f"{Fore.LIGHTBLACK_EX}Not a valid git repo: {git_dir!r}{Fore.RESET}")
-        print()
+            Daemon(options, jobs=jobs).serve(git_dirs)
+        except OSError as exc:
+            raise click.ClickException(str(exc)) from exc
+        return
+
+    # ask the daemon for each repository's snapshot as it's found, if it responds
+    # (snapshots may be missing, e.g., for repositories it has not seen yet)
+    use_daemon = use_daemon and socket_path().exists() and query([]) is not None
+
+    snapshot_cache = SnapshotCache().load() if cache or clear_cache else None
+    if clear_cache:
+        snapshot_cache.clear()
+
+    # imap yields results in submission order, so each report is printed as soon as it
+    # and all the reports before it are done (even while repos are still being found)
+    def run_report(git_dir: str) -> List[str]:
+        if use_daemon and (snapshot := (query([git_dir], options) or [None])[0]):
+            return list(iter_report(snapshot))
+        return report(git_dir, cache=snapshot_cache, **options)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for lines in imap(executor, run_report, git_dirs):
+            for line in lines:
+                print(line)
+            print()
+
+    if snapshot_cache:
+        snapshot_cache.save()
 
 
 main = cli.main
@@ -0,0 +1,237 @@
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, TYPE_CHECKING, Union
+import hashlib
+import json
+import logging
+import os
+import time
+
+from ..util import cache_path
+
+if TYPE_CHECKING:
+    import git
+
+logger = logging.getLogger(__name__)
+
+# bump whenever the structure of snapshots (or fingerprints) changes
+VERSION = 5
+
+
+def stat_fingerprint(path: Union[str, Path]) -> Optional[List[int]]:
+    """
+    Return [mtime_ns, size] for `path`, or None if it does not exist.
+    """
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat_result.st_mtime_ns, stat_result.st_size]
+
+
+def iter_index_paths(data: bytes) -> Iterator[bytes]:
+    """
+    Iterate over the paths of the entries in git index file `data` (versions 2-4; see
+    gitformat-index(5)), raising ValueError for anything else.
+    """
+    if data[:4] != b"DIRC":
+        raise ValueError("Not a git index file")
+    version = int.from_bytes(data[4:8], "big")
+    if version not in (2, 3, 4):
+        raise ValueError(f"Unsupported index version: {version}")
+    count = int.from_bytes(data[8:12], "big")
+    position = 12
+    path = b""
+    for _ in range(count):
+        # ctime, mtime, dev, ino, mode, uid, gid, size, object name
+        start = position
+        flags = int.from_bytes(data[start + 60 : start + 62], "big")
+        position += 62
+        if flags & 0x4000:
+            # extended flags (version 3 and later)
+            position += 2
+        if version == 4:
+            # the path is the previous one, minus some bytes, plus a suffix
+            byte = data[position]
+            position += 1
+            strip = byte & 0x7F
+            while byte & 0x80:
+                byte = data[position]
+                position += 1
+                strip = ((strip + 1) << 7) | (byte & 0x7F)
+            end = data.index(b"\0", position)
+            path = path[: len(path) - strip] + data[position:end]
+            position = end + 1
+        else:
+            end = data.index(b"\0", position)
+            path = data[position:end]
+            # entries are padded with 1-8 NULs to a multiple of 8 bytes
+            position = start + ((end - start) // 8 + 1) * 8
+        yield path
+
+
+def tracked_files_fingerprint(working_tree_dir: str, index_path: Path) -> str:
+    """
+    Hash the paths, mtimes, and sizes of all the files listed in the index (as they
+    are in the working tree now), so that editing any of them changes the result.
+    """
+    try:
+        data = index_path.read_bytes()
+    except FileNotFoundError:
+        return ""
+    digest = hashlib.sha1()
+    root = os.fsencode(working_tree_dir)
+    try:
+        for path in iter_index_paths(data):
+            try:
+                stat_result = os.lstat(os.path.join(root, path))
+            except (FileNotFoundError, NotADirectoryError):
+                digest.update(b"%s\0-\n" % path)
+                continue
+            mtime_ns, size = stat_result.st_mtime_ns, stat_result.st_size
+            digest.update(b"%s\0%d %d\n" % (path, mtime_ns, size))
+    except (ValueError, IndexError) as exc:
+        # e.g., a split index; fall back to the index's own stat
+        logger.debug("Cannot read index %s: %s", index_path, exc)
+        return ""
+    return digest.hexdigest()
+
+
+def upstream_ref(repo: "git.Repo", ref: str) -> Optional[str]:
+    """
+    Get the ref that the branch with (full) ref `ref` tracks, e.g.,
+    "refs/remotes/origin/main" for "refs/heads/main", from the repository's own config
+    (without running git), or None if it has no upstream.
+    """
+    if not ref.startswith("refs/heads/"):
+        return None
+    section = f'branch "{ref[len("refs/heads/") :]}"'
+    with repo.config_reader("repository") as config:
+        remote = config.get_value(section, "remote", "")
+        merge = config.get_value(section, "merge", "")
+    if not (remote and merge.startswith("refs/heads/")):
+        return None
+    if remote == ".":
+        return merge
+    return f"refs/remotes/{remote}/{merge[len('refs/heads/') :]}"
+
+
+def fingerprint(repo: "git.Repo") -> List[list]:
+    """
+    Summarize the state of `repo` cheaply (without running git), as a list of
+    [name, mtime_ns, size] entries covering:
+    * .git/index, HEAD, packed-refs, and config
+    * the loose refs of the current branch and of its upstream
+    * the working tree's top-level directory and its immediate subdirectories
+    plus a ["tracked", digest] entry covering the stat of every tracked file (see
+    `tracked_files_fingerprint`).
+
+    Changes that affect none of these (e.g., creating an untracked file more than
+    one directory deep) are not detected; such snapshots must be invalidated
+    explicitly.
+    """
+    git_dir = Path(repo.git_dir)
+    common_dir = Path(repo.common_dir)
+    names = {
+        "index": git_dir / "index",
+        "HEAD": git_dir / "HEAD",
+        "packed-refs": common_dir / "packed-refs",
+        "config": common_dir / "config",
+    }
+    try:
+        head = names["HEAD"].read_text().strip()
+    except FileNotFoundError:
+        head = ""
+    if head.startswith("ref: "):
+        ref = head[len("ref: ") :]
+        names[ref] = common_dir / ref
+        if upstream := upstream_ref(repo, ref):
+            names[upstream] = common_dir / upstream
+    result = [[name, *(stat_fingerprint(path) or [])] for name, path in names.items()]
+    if working_tree_dir := repo.working_tree_dir:
+        result.append(
+            ["tracked", tracked_files_fingerprint(working_tree_dir, names["index"])]
+        )
+        result.append([".", *(stat_fingerprint(working_tree_dir) or [])])
+        with os.scandir(working_tree_dir) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name != ".git" and entry.is_dir(follow_symlinks=False):
+                    stat_result = entry.stat(follow_symlinks=False)
+                    result.append([entry.name, stat_result.st_mtime_ns])
+    return result
+
+
+class SnapshotCache:
+    """
+    Persistent mapping from repository path to its most recent snapshot, which is only
+    valid as long as the repository's fingerprint has not changed.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_age: float = 30 * 86400):
+        self.path = path or cache_path("summary.json")
+        self.max_age = max_age
+        self.entries: Dict[str, dict] = {}
+
+    def load(self) -> "SnapshotCache":
+        try:
+            with self.path.open() as fp:
+                data = json.load(fp)
+        except (FileNotFoundError, ValueError) as exc:
+            logger.debug("Starting with empty snapshot cache: %s", exc)
+            return self
+        if data.get("version") == VERSION:
+            self.entries = data["entries"]
+        return self
+
+    def save(self):
+        """
+        Write entries to disk, first evicting entries for repositories that no longer
+        exist or that have not been used in the last `max_age` seconds.
+        """
+        oldest = time.time() - self.max_age
+        self.entries = {
+            path: entry
+            for path, entry in self.entries.items()
+            if entry["used"] >= oldest and os.path.isdir(path)
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        with temporary_path.open("w") as fp:
+            json.dump({"version": VERSION, "entries": self.entries}, fp)
+        os.replace(temporary_path, self.path)
+
+    def clear(self):
+        self.entries = {}
+
+    def get(
+        self,
+        repo: "git.Repo",
+        create: Callable[["git.Repo"], dict],
+        options: Optional[dict] = None,
+    ) -> dict:
+        """
+        Return cached snapshot for `repo` if its fingerprint still matches (and it was
+        created with the same `options`), otherwise call `create(repo)` and cache the
+        result.
+        """
+        key = repo.working_dir
+        current = fingerprint(repo)
+        entry = self.entries.get(key)
+        if entry and entry["fingerprint"] == current and entry["options"] == options:
+            logger.debug("Using cached snapshot for %s", key)
+            entry["used"] = time.time()
+            return entry["snapshot"]
+        snapshot = create(repo)
+        # running git may update the index, which would change the fingerprint;
+        # only cache the snapshot if the repository was stable throughout
+        if fingerprint(repo) == current:
+            # round-trip through JSON so that cached and fresh snapshots are identical
+            snapshot = json.loads(json.dumps(snapshot))
+            self.entries[key] = {
+                "fingerprint": current,
+                "options": options,
+                "snapshot": snapshot,
+                "used": time.time(),
+            }
+        else:
+            self.entries.pop(key, None)
+        return snapshot
@@ -0,0 +1,325 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TYPE_CHECKING
+import errno
+import json
+import logging
+import os
+import selectors
+import socket
+import time
+
+from .. import inotify
+from ..util import cache_path
+from .snapshot import create
+
+if TYPE_CHECKING:
+    import git
+
+logger = logging.getLogger(__name__)
+
+# files directly in the git dir whose changes affect snapshots
+GIT_DIR_NAMES = frozenset({"HEAD", "index", "packed-refs"})
+
+
+def socket_path() -> Path:
+    """
+    Path of the daemon's Unix domain socket: in `$XDG_RUNTIME_DIR/git-utils` if that
+    is set, otherwise in the cache directory.
+    """
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime_dir, "git-utils", "summary.sock")
+    return cache_path("summary.sock")
+
+
+def iter_directories(top: str, skip: Iterable[str] = ()) -> Iterator[str]:
+    """
+    Iterate over `top` and all directories below it (not following symlinks), except
+    those in `skip` and below them. Each directory is yielded before it's listed, so
+    that a consumer that starts watching it then can't miss any new subdirectories.
+    """
+    skip = set(skip)
+    pending = [top]
+    while pending:
+        directory = pending.pop()
+        yield directory
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False) and entry.path not in skip:
+                        pending.append(entry.path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError) as exc:
+            logger.warning("Could not scan directory: %s", exc)
+
+
+def iter_watched_directories(repo: "git.Repo") -> Iterator[str]:
+    """
+    Iterate over the directories whose changes can affect `repo`'s snapshot: its git
+    dir, all directories under refs/, and all directories in its working tree except
+    the git dir and directories that are ignored as a whole.
+    """
+    git_dir = os.path.realpath(repo.git_dir)
+    yield git_dir
+    working_dir = os.path.realpath(repo.working_dir)
+    output = repo.git.ls_files(
+        "--others", "--ignored", "--exclude-standard", "--directory", "-z"
+    )
+    skip = {
+        os.path.join(working_dir, path.rstrip("/"))
+        for path in output.split("\0")
+        if path.endswith("/")
+    }
+    skip.add(git_dir)
+    skip.add(os.path.join(working_dir, ".git"))
+    yield from iter_directories(os.path.join(os.path.realpath(repo.common_dir), "refs"))
+    yield from iter_directories(working_dir, skip)
+
+
+def create_quietly(repo: "git.Repo", **options) -> dict:
+    """
+    Like `snapshot.create`, but without letting git refresh the index, which would
+    trigger more inotify events.
+    """
+    repo.git.update_environment(GIT_OPTIONAL_LOCKS="0")
+    return create(repo, **options)
+
+
+class Daemon:
+    """
+    Keep snapshots (see `snapshot.create`) of many repositories up to date, watching
+    their git dirs and working trees with inotify and recreating the snapshot of a
+    repository once no more events have arrived for it for `debounce` seconds, and
+    serve them over a Unix domain socket (see `query`).
+
+    Snapshots are keyed by the real path of the repository's working tree. `options`
+    are passed to `snapshot.create`; queries with different options are not answered.
+    """
+
+    def __init__(
+        self,
+        options: Optional[dict] = None,
+        path: Optional[Path] = None,
+        debounce: float = 0.2,
+        jobs: int = 4,
+    ):
+        self.options = options or {}
+        self.path = path or socket_path()
+        self.debounce = debounce
+        self.inotify = inotify.Inotify()
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.snapshots: Dict[str, dict] = {}
+        # watch descriptor -> (key, directory)
+        self.watches: Dict[int, tuple] = {}
+        # real paths of the git dirs of watched repositories
+        self.git_dirs: Set[str] = set()
+        # keys of repositories with changes -> time of their latest event
+        self.dirty: Dict[str, float] = {}
+        # keys of repositories whose snapshots are being created
+        self.running: Set[str] = set()
+        # keys of repositories with directories that could not be watched
+        self.unwatchable: Set[str] = set()
+        # real paths of repositories that are being added
+        self.adding: Set[str] = set()
+        self.stopped = False
+
+    def add(self, git_dir: str):
+        """
+        Start watching the repository at `git_dir` (unless it's bare or already
+        watched), and schedule its snapshot.
+        """
+        # GitPython is only imported where it's used, so that querying stays fast
+        from git import Repo
+
+        with Repo(git_dir) as repo:
+            if repo.bare:
+                return
+            key = os.path.realpath(repo.working_dir)
+            if key in self.snapshots or key in self.dirty:
+                return
+            self.git_dirs.add(os.path.realpath(repo.git_dir))
+            for directory in iter_watched_directories(repo):
+                self.watch(key, directory)
+        self.dirty[key] = 0
+
+    def watch(self, key: str, directory: str):
+        try:
+            wd = self.inotify.add_watch(directory)
+        except OSError as exc:
+            # e.g., ENOSPC when fs.inotify.max_user_watches is exceeded; changes may
+            # be missed, so this repository's snapshots can't be trusted
+            logger.warning("Cannot watch %s: %s", directory, exc)
+            self.unwatchable.add(key)
+            return
+        self.watches[wd] = (key, directory)
+
+    def add_later(self, git_dir: str):
+        """
+        Add the repository at `git_dir` in the background (see `add`), which may take
+        a while, since it lists ignored files and every directory in its working tree.
+        """
+        path = os.path.realpath(git_dir)
+        if path in self.adding:
+            return
+        self.adding.add(path)
+
+        def added(future: Future):
+            if exc := future.exception():
+                logger.warning("Cannot watch repository %s: %s", git_dir, exc)
+            self.adding.discard(path)
+
+        self.executor.submit(self.add, git_dir).add_done_callback(added)
+
+    def handle_events(self):
+        now = time.monotonic()
+        for event in self.inotify.read():
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                logger.warning("Missed inotify events; refreshing all snapshots")
+                self.dirty.update(dict.fromkeys(list(self.snapshots), now))
+                continue
+            if event.mask & inotify.IN_IGNORED:
+                self.watches.pop(event.wd, None)
+                continue
+            if (watch := self.watches.get(event.wd)) is None:
+                continue
+            key, directory = watch
+            if event.name.endswith(".lock"):
+                continue
+            if directory in self.git_dirs and event.name not in GIT_DIR_NAMES:
+                continue
+            if event.mask & inotify.IN_ISDIR and event.mask & inotify.IN_CREATE:
+                # its subdirectories may have been created before it could be watched
+                # (e.g., by `mkdir -p`), so watch them all, and only then mark the
+                # repository dirty, so that the snapshot reflects their contents
+                for subdirectory in iter_directories(
+                    os.path.join(directory, event.name)
+                ):
+                    self.watch(key, subdirectory)
+                now = time.monotonic()
+            self.dirty[key] = now
+
+    def refresh(self):
+        """
+        Create snapshots (in the background) of dirty repositories whose latest event
+        was at least `debounce` seconds ago.
+        """
+        now = time.monotonic()
+        for key, changed in list(self.dirty.items()):
+            if key in self.running or now - changed < self.debounce:
+                continue
+            del self.dirty[key]
+            self.running.add(key)
+            future = self.executor.submit(self.create, key)
+            future.add_done_callback(lambda future, key=key: self.created(key, future))
+
+    def create(self, key: str) -> dict:
+        from git import Repo
+
+        with Repo(key) as repo:
+            return create_quietly(repo, **self.options)
+
+    def created(self, key: str, future: Future):
+        try:
+            self.snapshots[key] = json.loads(json.dumps(future.result()))
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error("Failed to create snapshot of %s: %s", key, exc)
+            self.snapshots.pop(key, None)
+        self.running.discard(key)
+
+    def answer(self, request: dict) -> dict:
+        """
+        Return the current snapshot for each of `request["paths"]`, or None for any
+        that are not (yet) known, have changes that are not reflected yet, or cannot be
+        watched completely; paths not watched yet are added in the background.
+        """
+        if request.get("options", {}) != self.options:
+            return {"snapshots": [None] * len(request["paths"])}
+        snapshots = []
+        for path in request["paths"]:
+            key = os.path.realpath(path)
+            if key in self.dirty or key in self.running or key in self.unwatchable:
+                snapshots.append(None)
+            elif (snapshot := self.snapshots.get(key)) is not None:
+                snapshots.append(snapshot)
+            else:
+                snapshots.append(None)
+                self.add_later(path)
+        return {"snapshots": snapshots}
+
+    def handle_connection(self, server: socket.socket):
+        connection, _ = server.accept()
+        with connection:
+            connection.settimeout(1)
+            try:
+                with connection.makefile("rb") as reader:
+                    request = json.loads(reader.readline())
+                response = json.dumps(self.answer(request)).encode() + b"\n"
+                connection.sendall(response)
+            except (OSError, ValueError, KeyError) as exc:
+                logger.warning("Bad request: %s", exc)
+
+    def serve(self, git_dirs: Iterable[str] = ()):
+        """
+        Watch `git_dirs` (which are added in the background) and answer queries until
+        `stop` is called. Raises OSError (EADDRINUSE) if another daemon is already
+        listening at `self.path`.
+        """
+        if self.path.exists():
+            if query([], path=self.path) is not None:
+                self.executor.shutdown()
+                self.inotify.close()
+                raise OSError(
+                    errno.EADDRINUSE, "Daemon already running", str(self.path)
+                )
+            # left behind by a daemon that didn't exit cleanly
+            self.path.unlink()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for git_dir in git_dirs:
+            self.add_later(git_dir)
+        with socket.socket(
+            socket.AF_UNIX
+        ) as server, selectors.DefaultSelector() as sel:
+            server.bind(str(self.path))
+            server.listen()
+            sel.register(server, selectors.EVENT_READ)
+            sel.register(self.inotify, selectors.EVENT_READ)
+            logger.info("Listening on %s", self.path)
+            try:
+                while not self.stopped:
+                    self.refresh()
+                    for key, _ in sel.select(timeout=self.debounce / 2):
+                        if key.fileobj is server:
+                            self.handle_connection(server)
+                        else:
+                            self.handle_events()
+            finally:
+                self.path.unlink()
+                self.executor.shutdown()
+                self.inotify.close()
+
+    def stop(self):
+        self.stopped = True
+
+
+def query(
+    git_dirs: List[str],
+    options: Optional[dict] = None,
+    path: Optional[Path] = None,
+    timeout: float = 1.0,
+) -> Optional[List[Optional[dict]]]:
+    """
+    Ask the daemon listening at `path` (default: `socket_path()`) for the current
+    snapshots of `git_dirs`, returning a list with a snapshot (or None) for each, or
+    None if no daemon is running.
+    """
+    request = {"paths": [os.path.abspath(git_dir) for git_dir in git_dirs]}
+    request["options"] = options or {}
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.settimeout(timeout)
+            client.connect(str(path or socket_path()))
+            client.sendall(json.dumps(request).encode() + b"\n")
+            with client.makefile("rb") as reader:
+                return json.loads(reader.readline())["snapshots"]
+    except (OSError, ValueError) as exc:
+        logger.debug("Cannot query daemon: %s", exc)
+        return None
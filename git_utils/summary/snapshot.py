@@ -1,33 +1,99 @@
-from typing import Iterator
+from typing import Dict, Iterator, Optional, TYPE_CHECKING
 import logging
 import re
 
 from colorama import Fore, Style
-from git import Repo
 
-from ..repo import status
+if TYPE_CHECKING:
+    import git
 
 logger = logging.getLogger(__name__)
 
 Style_REVERSE = "\x1b[7m"
 
 
-def create(repo: Repo) -> dict:
+def create(
+    repo: "git.Repo",
+    max_entries: Optional[int] = None,
+    untracked_files: Optional[str] = None,
+) -> dict:
+    """
+    Collect branch tracking info, stash count, path statuses, and heads that do not
+    coincide with any remote ref, using just two git processes.
+
+    See `status_v2` for `max_entries` and `untracked_files`.
+    """
+    # GitPython is slow to import, and not needed for reports of cached snapshots
+    from ..repo import for_each_ref, status_v2
+
+    headers, entries, counts = status_v2(repo, max_entries, untracked_files)
+    refs = for_each_ref(repo, "refs/heads", "refs/remotes")
+    remote_objectnames = {
+        objectname
+        for objectname, refname in refs
+        if refname.startswith("refs/remotes/")
+    }
     return {
         "path": repo.working_dir,
-        "branch_and_status": status(repo, branch=True),
+        "headers": headers,
+        "entries": entries,
+        "counts": counts,
+        "heads_off_remote": [
+            refname[len("refs/heads/") :]
+            for objectname, refname in refs
+            if refname.startswith("refs/heads/")
+            and objectname not in remote_objectnames
+        ],
     }
 
 
+def format_tracking_info(headers: Dict[str, str]) -> str:
+    """
+    Reconstruct the "branchname tracking info" of `git status --porcelain=v1 --branch`
+    from `git status --porcelain=v2 --branch` headers.
+    """
+    head = headers.get("branch.head")
+    if head == "(detached)":
+        return "HEAD (no branch)"
+    if headers.get("branch.oid") == "(initial)":
+        return f"No commits yet on {head}"
+    if not (upstream := headers.get("branch.upstream")):
+        return head
+    if not (ab := headers.get("branch.ab")):
+        return f"{head}...{upstream} [gone]"
+    ahead, behind = (int(count) for count in ab.split())
+    divergence = [
+        f"{label} {abs(count)}"
+        for label, count in (("ahead", ahead), ("behind", behind))
+        if count
+    ]
+    if divergence:
+        return f"{head}...{upstream} [{', '.join(divergence)}]"
+    return f"{head}...{upstream}"
+
+
 def iter_report(snapshot: dict) -> Iterator[str]:
     path = snapshot["path"]
-    (_, branchname_tracking_info), *statuses = snapshot["branch_and_status"]
+    headers = snapshot["headers"]
+    branchname_tracking_info = format_tracking_info(headers)
+    stashes = int(headers.get("stash", 0))
+    other_heads_off_remote = [
+        head
+        for head in snapshot["heads_off_remote"]
+        if head != headers.get("branch.head")
+    ]
+    statuses = snapshot["entries"]
 
     yield f"{Style_REVERSE}{path}{Style.RESET_ALL}"
     if not re.match(r"^([-a-z]+)...origin/\1$", branchname_tracking_info):
         yield f"{Fore.MAGENTA}{branchname_tracking_info}{Fore.RESET}"
-    elif not statuses:
+    elif not (statuses or stashes or other_heads_off_remote):
         yield "clean and committed"
+    if stashes:
+        yield f"{Fore.CYAN}{stashes} stash{'es' if stashes > 1 else ''}{Fore.RESET}"
+    if other_heads_off_remote:
+        heads = ", ".join(other_heads_off_remote)
+        yield f"{Fore.MAGENTA}not on any remote: {heads}{Fore.RESET}"
     for xy, path in statuses:
         if xy == " M":
             yield f"{Fore.BLUE}{xy} {path}{Fore.RESET}"
@@ -39,3 +105,8 @@ def iter_report(snapshot: dict) -> Iterator[str]:
             yield f"{Fore.YELLOW}{xy} {path}{Fore.RESET}"
         else:
             yield f"{xy} {path}"
+    if (omitted := sum(snapshot["counts"].values()) - len(statuses)) > 0:
+        counts = ", ".join(
+            f"{count} {xy}" for xy, count in sorted(snapshot["counts"].items())
+        )
+        yield f"{Fore.LIGHTBLACK_EX}... {omitted} more ({counts} in all){Fore.RESET}"
@@ -0,0 +1,297 @@
+from contextlib import contextmanager, ExitStack, nullcontext
+from typing import Callable, ContextManager, Iterator, List, Optional, TYPE_CHECKING
+import json
+import logging
+import os
+import threading
+import time
+
+import click
+
+if TYPE_CHECKING:
+    import git
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """
+    Collect spans of time as Chrome trace "complete" events, which can be viewed with
+    chrome://tracing or https://ui.perfetto.dev/
+    """
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[dict]:
+        """
+        Record the time taken by the body of the with-statement, which can add more
+        details by updating the yielded dict of `args`.
+        """
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            ended = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (started - self.origin) * 1e6,
+                "dur": (ended - started) * 1e6,
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def write(self, path: str):
+        with open(path, "w") as fp:
+            trace = {"traceEvents": self.events, "displayTimeUnit": "ms"}
+            json.dump(trace, fp, default=str)
+
+    def slowest(self, count: int = 10, category: Optional[str] = None) -> List[dict]:
+        events = [
+            event
+            for event in self.events
+            if category is None or event["cat"] == category
+        ]
+        return sorted(events, key=lambda event: event["dur"], reverse=True)[:count]
+
+
+# the active Tracer, if any
+tracer: Optional[Tracer] = None
+# original functions that have been replaced with traced versions
+originals = {}
+
+
+def span(name: str, category: str, **args) -> ContextManager[dict]:
+    """
+    Record span with the active Tracer, if there is one.
+    """
+    if tracer is None:
+        return nullcontext(args)
+    return tracer.span(name, category, **args)
+
+
+def git_command_name(command) -> str:
+    """
+    Summarize git command, e.g., ["git", "-c", "x=y", "status", "-z"] -> "git status"
+    """
+    if isinstance(command, str):
+        return command
+    args = iter(map(str, command))
+    name = next(args, "")
+    for arg in args:
+        if arg in ("-c", "-C"):
+            next(args, None)
+        elif not arg.startswith("-"):
+            return f"{name} {arg}"
+    return name
+
+
+class TracedStream:
+    """
+    Wrap binary stream (e.g., a process's stdout), adding the number of bytes read
+    from it to `span_args["stdout_bytes"]`.
+    """
+
+    def __init__(self, stream, span_args: dict):
+        self.stream = stream
+        self.span_args = span_args
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.span_args["stdout_bytes"] += len(data)
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        line = self.stream.readline(size)
+        self.span_args["stdout_bytes"] += len(line)
+        return line
+
+    def __iter__(self) -> "TracedStream":
+        return self
+
+    def __next__(self) -> bytes:
+        if line := self.readline():
+            return line
+        raise StopIteration
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
+class TracedProcess:
+    """
+    Wrap git process started with `as_process=True`, counting the bytes read from its
+    stdout and keeping its span open until it's waited on (or discarded).
+    """
+
+    def __init__(self, process, span_args: dict, exit_stack: ExitStack):
+        self.process = process
+        self.span_args = span_args
+        self.exit_stack = exit_stack
+        span_args["stdout_bytes"] = 0
+        self.stdout = TracedStream(process.stdout, span_args)
+
+    def wait(self, *args, **kwargs) -> int:
+        from git import GitCommandError
+
+        with self.exit_stack:
+            try:
+                status = self.process.wait(*args, **kwargs)
+            except GitCommandError as exc:
+                self.span_args["status"] = exc.status
+                self.span_args["stderr_bytes"] = len(exc.stderr or "")
+                raise
+            self.span_args["status"] = status
+            return status
+
+    def __getattr__(self, name: str):
+        return getattr(self.process, name)
+
+    def __del__(self):
+        self.exit_stack.close()
+
+
+def traced_git_execute(self: "git.Git", command, *args, **kwargs):
+    from git import GitCommandError
+
+    with ExitStack() as exit_stack:
+        span_args = exit_stack.enter_context(
+            span(
+                git_command_name(command),
+                "git",
+                command=(
+                    command if isinstance(command, str) else list(map(str, command))
+                ),
+                cwd=self._working_dir,  # pylint: disable=protected-access
+            )
+        )
+        try:
+            result = originals["git"](self, command, *args, **kwargs)
+        except GitCommandError as exc:
+            span_args["status"] = exc.status
+            span_args["stderr_bytes"] = len(exc.stderr or "")
+            raise
+        if kwargs.get("as_process"):
+            # the process is still running, and its output is read elsewhere, so the
+            # span ends when it's waited on
+            return TracedProcess(result, span_args, exit_stack.pop_all())
+        if isinstance(result, tuple):
+            status, stdout, stderr = result
+            span_args |= {
+                "status": status,
+                "stdout_bytes": len(stdout or ""),
+                "stderr_bytes": len(stderr or ""),
+            }
+        else:
+            span_args["status"] = 0
+            span_args["stdout_bytes"] = len(result or "")
+        return result
+
+
+def traced_make_api_call(self, operation_name: str, api_params: dict):
+    service = self.meta.service_model.service_name
+    with span(
+        f"{service}.{operation_name}",
+        "aws",
+        region=self.meta.region_name,
+        params=sorted(api_params),
+    ) as span_args:
+        # not set if interrupted before the call returns (e.g., by KeyboardInterrupt)
+        response = {}
+        try:
+            response = originals["boto"](self, operation_name, api_params)
+        except Exception as exc:
+            response = getattr(exc, "response", None) or {}
+            raise
+        finally:
+            metadata = response.get("ResponseMetadata", {})
+            span_args["status"] = metadata.get("HTTPStatusCode")
+            span_args["retries"] = metadata.get("RetryAttempts")
+        return response
+
+
+def start() -> Tracer:
+    """
+    Start recording git commands (run via GitPython), GitHub API requests, and AWS API
+    calls (made with botocore, if it's installed).
+    """
+    from git import Git
+
+    global tracer  # pylint: disable=global-statement
+    tracer = Tracer()
+    if "git" not in originals:
+        originals["git"] = Git.execute
+        Git.execute = traced_git_execute
+    if "boto" not in originals:
+        try:
+            from botocore.client import BaseClient
+        except ImportError:
+            pass
+        else:
+            # pylint: disable=protected-access
+            originals["boto"] = BaseClient._make_api_call
+            BaseClient._make_api_call = traced_make_api_call
+    return tracer
+
+
+def stop() -> Optional[Tracer]:
+    """
+    Stop recording, restoring the original functions, and return the Tracer.
+    """
+    global tracer  # pylint: disable=global-statement
+    if "git" in originals:
+        from git import Git
+
+        Git.execute = originals.pop("git")
+    if "boto" in originals:
+        from botocore.client import BaseClient
+
+        # pylint: disable=protected-access
+        BaseClient._make_api_call = originals.pop("boto")
+    stopped, tracer = tracer, None
+    return stopped
+
+
+def finish(path: str, count: int = 10):
+    """
+    Stop recording, write trace to `path`, and print the slowest spans to stderr.
+    """
+    stopped = stop()
+    if stopped is None:
+        return
+    stopped.write(path)
+    click.echo(f"Wrote {len(stopped.events)} events to {path}; slowest:", err=True)
+    for event in stopped.slowest(count):
+        milliseconds = event["dur"] / 1000
+        details = event["args"].get("cwd") or event["args"].get("url") or ""
+        line = f"{milliseconds:10.1f}ms {event['cat']:<5} {event['name']} {details}"
+        click.echo(line, err=True)
+
+
+def profile_option(function: Callable) -> Callable:
+    """
+    Add --profile FILE option to click command `function`.
+    """
+
+    def callback(ctx: click.Context, param: click.Parameter, value: Optional[str]):
+        if value is not None:
+            start()
+            ctx.call_on_close(lambda: finish(value))
+
+    return click.option(
+        "--profile",
+        type=click.Path(dir_okay=False),
+        expose_value=False,
+        callback=callback,
+        help="Write trace of git commands and HTTP requests to FILE (in Chrome trace "
+        "format, for chrome://tracing or ui.perfetto.dev) and print the slowest.",
+    )(function)
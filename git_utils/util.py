@@ -1,14 +1,13 @@
-from collections.abc import Set
+from collections import deque
+from collections.abc import Mapping, Set
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Any, Callable, Iterable, Union
+from typing import Any, Callable, Iterable, Iterator, List, Optional
 import json
 import os
 import re
 import urllib.parse
 
-from filesystemlib import walk
-from requests.models import CaseInsensitiveDict
-
 
 def delete_keys(value: Any, pred: Callable[[str], bool]) -> Any:
     """
@@ -21,18 +20,169 @@ def delete_keys(value: Any, pred: Callable[[str], bool]) -> Any:
     return value
 
 
+def compile_fields(fields: Iterable[str]) -> dict:
+    """
+    Compile dotted field paths (e.g., "owner.login") into a tree of nested dicts, for
+    `project`, where None means to keep the whole value.
+    """
+    tree: dict = {}
+    for field in fields:
+        node = tree
+        *parents, leaf = field.split(".")
+        for key in parents:
+            node = node.setdefault(key, {})
+            if node is None:
+                # already keeping the whole value
+                break
+        else:
+            node[leaf] = None
+    return tree
+
+
+def project(value: Any, tree: Optional[dict]) -> Any:
+    """
+    Select only the paths in `tree` (see `compile_fields`) from `value`, recursing
+    into dicts and lists, without copying anything else.
+    """
+    if tree is None:
+        return value
+    if isinstance(value, dict):
+        return {
+            key: project(value[key], subtree)
+            for key, subtree in tree.items()
+            if key in value
+        }
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    return value
+
+
+def imap(
+    executor: Executor,
+    fn: Callable[[Any], Any],
+    iterable: Iterable,
+    window: Optional[int] = None,
+) -> Iterator:
+    """
+    Like `executor.map(fn, iterable)`, but consume `iterable` lazily, keeping at most
+    `window` calls (default: twice the number of workers) submitted ahead of the
+    result currently being waited on. Results are yielded in order.
+    """
+    if window is None:
+        window = 2 * getattr(executor, "_max_workers", os.cpu_count() or 1)
+    futures = deque()
+    try:
+        for item in iterable:
+            futures.append(executor.submit(fn, item))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+            # don't hold back results that are already available
+            while futures and futures[0].done():
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# whitespace allowed between JSON tokens (same as json.decoder.WHITESPACE)
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def decode_json_stream(
+    chunks: Iterable[str], decoder: Optional[json.JSONDecoder] = None
+) -> Any:
+    """
+    Decode JSON document from `chunks` of text. If it's an array, return an iterator
+    over its items, which decodes each item as soon as it's complete instead of
+    reading the whole document first; otherwise, return the decoded value.
+    """
+    decoder = decoder or json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    while pos == len(buffer):
+        if (chunk := next(chunks, None)) is None:
+            break
+        buffer += chunk
+        pos = JSON_WHITESPACE.match(buffer, pos).end()
+    if buffer[pos : pos + 1] != "[":
+        return decoder.decode(buffer + "".join(chunks))
+    return _iter_json_array_items(buffer, pos + 1, chunks, decoder)
+
+
+def _iter_json_array_items(
+    buffer: str, pos: int, chunks: Iterator[str], decoder: json.JSONDecoder
+) -> Iterator:
+    exhausted = False
+    after_item = False
+    first = True
+
+    def read(size: int) -> bool:
+        """
+        Replace consumed part of buffer with chunks until at least `size` characters
+        are available; return False if there's nothing more to read.
+        """
+        nonlocal buffer, pos, exhausted
+        parts = [buffer[pos:]]
+        length = len(parts[0])
+        while not exhausted and length < size:
+            if (chunk := next(chunks, None)) is None:
+                exhausted = True
+            else:
+                parts.append(chunk)
+                length += len(chunk)
+        buffer = "".join(parts)
+        pos = 0
+        return len(parts) > 1
+
+    while True:
+        pos = JSON_WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if not read(1):
+                raise json.JSONDecodeError("Unterminated array", buffer, pos)
+            continue
+        if buffer[pos] == "]" and (after_item or first):
+            return
+        if after_item:
+            if buffer[pos] != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos += 1
+            after_item = False
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # item may be incomplete; double what's available before trying again
+            if read(2 * (len(buffer) - pos)):
+                continue
+            raise
+        # a number may continue in the next chunk (e.g., "0" might be "0.5")
+        delimited = end < len(buffer) and buffer[end] in " \t\n\r,]"
+        if not delimited and read(len(buffer) - pos + 1):
+            continue
+        yield item
+        pos = end
+        after_item = True
+        first = False
+
+
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, o):
-        if isinstance(o, CaseInsensitiveDict):
+        # e.g., requests' CaseInsensitiveDict
+        if isinstance(o, Mapping):
             return dict(o.items())
         return json.JSONEncoder.default(self, o)
 
 
-def sumsize(top: Union[str, Path]) -> int:
+def cache_path(*parts: str) -> Path:
     """
-    Iterate through all paths in `top`, stat each one, and return total sum of sizes.
+    Resolve path within this package's cache directory, `$XDG_CACHE_HOME/git-utils`,
+    where XDG_CACHE_HOME defaults to `~/.cache`.
     """
-    return sum(map(os.path.getsize, walk(Path(top))))
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(cache_home, "git-utils", *parts)
 
 
 def normalize_url(url: str) -> str:
@@ -111,4 +261,84 @@ class LazySet(Set):
             yield item
 
     def __len__(self):
-        return sum(1 for _ in iter(self))
+        for item in self.iterator:
+            self.set.add(item)
+        return len(self.set)
+
+
+class BinshaSet(Set):
+    """
+    Like LazySet, but specialized for fixed-width binary SHAs (`width` bytes each),
+    which are stored compactly rather than as individual bytes objects in a set:
+    SHAs are distributed across 65,536 buckets by their first two bytes, and each
+    bucket is a single bytearray holding the remaining bytes of its SHAs back to back.
+    Since SHAs are uniformly distributed, buckets stay small, and searching one is
+    done in C (bytearray.find). This uses about 20 bytes per 20-byte SHA, rather
+    than ~90 bytes, and keeps track of the number of items (so len is O(1) once the
+    input has been consumed).
+
+    Lookups and additions are 3-5x slower than a set's, so only use this where
+    memory matters more than time (e.g., tens of millions of SHAs).
+    """
+
+    def __init__(self, iterable: Iterable[bytes] = (), width: int = 20):
+        self.iterator = iter(iterable)
+        self.width = width
+        self.buckets: List[Optional[bytearray]] = [None] * 0x10000
+        self.count = 0
+
+    def _has(self, item: bytes) -> bool:
+        bucket = self.buckets[(item[0] << 8) | item[1]]
+        if bucket is None:
+            return False
+        suffix = item[2:]
+        suffix_width = self.width - 2
+        position = bucket.find(suffix)
+        # only matches aligned with the start of a suffix count
+        while position != -1:
+            if position % suffix_width == 0:
+                return True
+            position = bucket.find(suffix, position + 1)
+        return False
+
+    def add(self, item: bytes) -> bool:
+        """
+        Add `item`, returning False if it was already present.
+        """
+        if len(item) != self.width:
+            raise ValueError(f"Expected {self.width}-byte item, not {item!r}")
+        if self._has(item):
+            return False
+        index = (item[0] << 8) | item[1]
+        if (bucket := self.buckets[index]) is None:
+            self.buckets[index] = bytearray(item[2:])
+        else:
+            bucket += item[2:]
+        self.count += 1
+        return True
+
+    def __contains__(self, item):
+        if not isinstance(item, (bytes, bytearray)) or len(item) != self.width:
+            return False
+        if self._has(item):
+            return True
+        for new_item in self.iterator:
+            if self.add(new_item) and item == new_item:
+                return True
+        return False
+
+    def __iter__(self):
+        suffix_width = self.width - 2
+        for index, bucket in enumerate(self.buckets):
+            if bucket is not None:
+                prefix = index.to_bytes(2, "big")
+                for offset in range(0, len(bucket), suffix_width):
+                    yield prefix + bucket[offset : offset + suffix_width]
+        for item in self.iterator:
+            if self.add(item):
+                yield item
+
+    def __len__(self):
+        for item in self.iterator:
+            self.add(item)
+        return self.count
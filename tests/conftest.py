@@ -0,0 +1,28 @@
+import pytest
+
+from git_utils.github.client import Client
+from github_stub import StubGitHub
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+    """
+    Make sure test repositories can be committed to, regardless of user config.
+    """
+    for role in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{role}_NAME", "Test")
+        monkeypatch.setenv(f"GIT_{role}_EMAIL", "test@example.com")
+
+
+@pytest.fixture
+def github_stub():
+    with StubGitHub() as server:
+        yield server
+
+
+@pytest.fixture
+def github_client(github_stub):
+    client = Client()
+    client.scheme = "http"
+    client.netloc = github_stub.netloc
+    return client
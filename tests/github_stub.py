@@ -0,0 +1,100 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Union
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+
+
+class StubGitHub(ThreadingHTTPServer):
+    """
+    Minimal local stand-in for the GitHub API.
+
+    `routes` maps paths either to lists, which are served as JSON and paginated like
+    GitHub does (per `page` and `per_page` query parameters, with rel="next" and
+    rel="last" Link headers), or to callables that take dicts of query parameters
+    (or the JSON body of POST requests) and request headers, and return (status,
+    body, headers). Successful responses have an ETag, and matching conditional
+    requests get '304 Not Modified'. Each request is delayed by `latency` seconds
+    and recorded in `requests` (as a (path, params) tuple).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StubGitHubHandler)
+        self.latency = latency
+        self.routes: Dict[str, Union[list, Callable[[dict, dict], tuple]]] = {}
+        self.requests: List[tuple] = []
+        self.lock = threading.Lock()
+
+    @property
+    def netloc(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def __enter__(self) -> "StubGitHub":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def paginate(items: list, path: str, params: dict) -> tuple:
+    per_page = int(params.get("per_page", 30))
+    page = int(params.get("page", 1))
+    last_page = max(1, -(-len(items) // per_page))
+    links = []
+    for rel, number in (("next", page + 1), ("last", last_page)):
+        if page < last_page:
+            query = urllib.parse.urlencode(params | {"page": number})
+            links.append(f'<{path}?{query}>; rel="{rel}"')
+    headers = {"Link": ", ".join(links)} if links else {}
+    return 200, items[(page - 1) * per_page : page * per_page], headers
+
+
+class StubGitHubHandler(BaseHTTPRequestHandler):
+    server: StubGitHub
+
+    def do_GET(self):
+        split_result = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(split_result.query))
+        self.respond(split_result, params)
+
+    def do_POST(self):
+        # pass JSON request body to route in place of query parameters
+        length = int(self.headers.get("Content-Length", 0))
+        self.respond(
+            urllib.parse.urlsplit(self.path), json.loads(self.rfile.read(length))
+        )
+
+    def respond(self, split_result: urllib.parse.SplitResult, params: dict):
+        with self.server.lock:
+            self.server.requests.append((split_result.path, params))
+        time.sleep(self.server.latency)
+        route = self.server.routes.get(split_result.path)
+        if route is None:
+            status, body, headers = 404, {"message": "Not Found"}, {}
+        elif callable(route):
+            status, body, headers = route(params, dict(self.headers))
+        else:
+            absolute_path = f"http://{self.server.netloc}{split_result.path}"
+            status, body, headers = paginate(route, absolute_path, params)
+        data = json.dumps(body).encode()
+        if status == 200:
+            headers["ETag"] = f'"{hashlib.sha1(data).hexdigest()}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, data = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,160 @@
+from pathlib import Path
+
+from botocore.stub import Stubber
+from git import Repo
+import boto3
+import pytest
+
+from git_utils import codecommit as codecommit_module
+from git_utils.codecommit.bulk import mirror_all
+from git_utils.codecommit.inventory import get_inventory, InventoryCache
+
+
+@pytest.fixture
+def codecommit():
+    client = boto3.client(
+        "codecommit",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def metadata(name: str, clone_url: str) -> dict:
+    return {
+        "repositoryName": name,
+        "Arn": f"arn:aws:codecommit:us-east-1:123456789012:{name}",
+        "cloneUrlSsh": clone_url,
+    }
+
+
+def test_mirror_all(tmp_path, codecommit):
+    client, stubber = codecommit
+    urls = []
+    for name in ("fresh", "stale", "new"):
+        upstream = Repo.init(tmp_path / "upstream" / name)
+        upstream.git.commit("--allow-empty", message=name)
+        Repo.init(tmp_path / "codecommit" / name, bare=True)
+        urls.append((tmp_path / "upstream" / name).as_uri())
+    urls.append((tmp_path / "upstream" / "missing").as_uri())
+    clone_urls = {
+        Path(url).name: (tmp_path / "codecommit" / Path(url).name).as_uri()
+        for url in urls
+    }
+    existing = [metadata(name, clone_urls[name]) for name in ("fresh", "stale")]
+    existing.append(metadata("missing", clone_urls["missing"]))
+    stubber.add_response(
+        "batch_get_repositories",
+        {"repositories": existing, "repositoriesNotFound": ["new"]},
+    )
+    # up-to-date repos are skipped before anything is cloned
+    for updated in ("2099-01-01", "2000-01-01", "2000-01-01"):
+        stubber.add_response("list_tags_for_resource", {"tags": {"updated": updated}})
+    stubber.add_client_error(
+        "get_repository", service_error_code="RepositoryDoesNotExistException"
+    )
+    stubber.add_response(
+        "create_repository",
+        {"repositoryMetadata": metadata("new", clone_urls["new"])},
+    )
+    stubber.add_response("tag_resource", {})
+    stubber.add_response("tag_resource", {})
+
+    results = mirror_all(
+        client,
+        urls,
+        namer=lambda url: Path(url).name,
+        min_updated="2020-01-01",
+        jobs=1,
+        incremental=False,
+    )
+    statuses = {result.name: result.status for result in results}
+    assert statuses == {
+        "fresh": "skipped",
+        "stale": "updated",
+        "new": "created",
+        "missing": "failed",
+    }
+    for name in ("stale", "new"):
+        heads = Repo(tmp_path / "codecommit" / name).heads
+        assert [head.commit.summary for head in heads] == [name]
+    assert not Repo(tmp_path / "codecommit" / "fresh").heads
+
+
+def test_mirror_all_incremental(tmp_path, codecommit, monkeypatch):
+    client, stubber = codecommit
+    # fetch and push one refspec at a time
+    monkeypatch.setattr(codecommit_module, "REFSPECS_BATCH_SIZE", 1)
+    urls = []
+    for name in ("fresh", "stale"):
+        upstream = Repo.init(tmp_path / "upstream" / name)
+        upstream.git.commit("--allow-empty", message=name)
+        upstream.git.branch("old")
+        destination = Repo.init(tmp_path / "codecommit" / name, bare=True)
+        upstream.git.push("--mirror", destination.git_dir)
+        urls.append((tmp_path / "upstream" / name).as_uri())
+    upstream.git.commit("--allow-empty", message="new")
+    upstream.git.tag("v1")
+    upstream.git.branch("-D", "old")
+    urls.append((tmp_path / "upstream" / "missing").as_uri())
+    existing = [
+        metadata(Path(url).name, (tmp_path / "codecommit" / Path(url).name).as_uri())
+        for url in urls
+    ]
+    stubber.add_response(
+        "batch_get_repositories",
+        {"repositories": existing, "repositoriesNotFound": []},
+    )
+    # refs can't be compared if the source is missing, so fall back to tags
+    stubber.add_response("list_tags_for_resource", {"tags": {}})
+    stubber.add_response("tag_resource", {})
+
+    results = mirror_all(client, urls, namer=lambda url: Path(url).name, jobs=1)
+    statuses = {result.name: result.status for result in results}
+    assert statuses == {"fresh": "skipped", "stale": "updated", "missing": "failed"}
+    destination = Repo(tmp_path / "codecommit" / "stale")
+    assert destination.git.for_each_ref() == upstream.git.for_each_ref()
+
+
+def test_get_inventory(tmp_path, codecommit):
+    client, stubber = codecommit
+    names = [f"repo{index:02d}" for index in range(30)]
+    stubber.add_response(
+        "list_repositories",
+        {
+            "repositories": [{"repositoryName": name} for name in names[:20]],
+            "nextToken": "page2",
+        },
+        {},
+    )
+    stubber.add_response(
+        "list_repositories",
+        {"repositories": [{"repositoryName": name} for name in names[20:]]},
+        {"nextToken": "page2"},
+    )
+    # metadata is looked up 25 names at a time
+    for batch in (names[:25], names[25:]):
+        stubber.add_response(
+            "batch_get_repositories",
+            {
+                "repositories": [metadata(name, "") for name in batch],
+                "repositoriesNotFound": [],
+            },
+            {"repositoryNames": batch},
+        )
+    for name in names:
+        stubber.add_response("list_tags_for_resource", {"tags": {"name": name}})
+
+    inventory = get_inventory(client, jobs=1)
+    assert [item["repositoryName"] for item in inventory] == names
+    assert all(item["tags"] == {"name": item["repositoryName"]} for item in inventory)
+
+    cache = InventoryCache("us-east-1", path=tmp_path / "inventory.json")
+    assert cache.load() is None
+    cache.save(inventory)
+    assert cache.load() == inventory
+    cache.ttl = -1
+    assert cache.load() is None
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+import errno
+import os
+import threading
+import time
+
+from click.testing import CliRunner
+from git import Repo
+import pytest
+
+from git_utils import inotify
+from git_utils.summary import __main__ as summary_main
+from git_utils.summary.daemon import Daemon, query
+
+try:
+    inotify.Inotify().close()
+except OSError:
+    pytest.skip("inotify is not available", allow_module_level=True)
+
+
+def wait_for_snapshot(git_dir, path, predicate, timeout=10, options=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = query([git_dir], options, path=path)
+        if result and result[0] and predicate(result[0]):
+            return result[0]
+        time.sleep(0.05)
+    raise TimeoutError(f"No matching snapshot of {git_dir}")
+
+
+@contextmanager
+def serving(daemon, git_dirs):
+    thread = threading.Thread(target=daemon.serve, args=(git_dirs,))
+    thread.start()
+    try:
+        while not daemon.path.exists():
+            assert thread.is_alive(), "daemon stopped before listening"
+            time.sleep(0.01)
+        yield
+    finally:
+        daemon.stop()
+        thread.join()
+    assert not daemon.path.exists()
+
+
+def test_daemon(tmp_path):
+    repo = Repo.init(tmp_path / "repo")
+    (tmp_path / "repo" / "src").mkdir()
+    (tmp_path / "repo" / "src" / "file.txt").write_text("one\n")
+    repo.index.add(["src/file.txt"])
+    repo.index.commit("first")
+    git_dir = str(tmp_path / "repo")
+    path = tmp_path / "summary.sock"
+    assert query([git_dir], path=path) is None
+
+    daemon = Daemon(path=path, debounce=0.05)
+    # directories that aren't repositories are skipped
+    with serving(daemon, [str(tmp_path), git_dir]):
+        snapshot = wait_for_snapshot(git_dir, path, lambda snapshot: True)
+        assert snapshot["entries"] == []
+        # changes in subdirectories are picked up
+        (tmp_path / "repo" / "src" / "file.txt").write_text("two\n")
+        snapshot = wait_for_snapshot(
+            git_dir, path, lambda snapshot: snapshot["entries"]
+        )
+        assert snapshot["entries"] == [[" M", "src/file.txt"]]
+        # including in nested directories created all at once
+        (tmp_path / "repo" / "src" / "a" / "b" / "c").mkdir(parents=True)
+        (tmp_path / "repo" / "src" / "a" / "b" / "c" / "file.txt").write_text("")
+        snapshot = wait_for_snapshot(
+            git_dir, path, lambda snapshot: len(snapshot["entries"]) == 2
+        )
+        assert snapshot["entries"][1] == ["??", "src/a/"]
+        # snapshots made with other options are not served
+        assert query([git_dir], {"max_entries": 1}, path=path) == [None]
+
+
+def test_daemon_unwatchable(tmp_path):
+    Repo.init(tmp_path / "repo")
+    (tmp_path / "repo" / "src").mkdir()
+    git_dir = str(tmp_path / "repo")
+    path = tmp_path / "summary.sock"
+    daemon = Daemon(path=path, debounce=0.05)
+    add_watch = daemon.inotify.add_watch
+
+    def limited_add_watch(directory, *args):
+        if directory.endswith("src"):
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC), directory)
+        return add_watch(directory, *args)
+
+    daemon.inotify.add_watch = limited_add_watch
+    with serving(daemon, [git_dir]):
+        # the repository is still snapshotted, but never served
+        deadline = time.monotonic() + 10
+        while os.path.realpath(git_dir) not in daemon.snapshots:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert query([git_dir], path=path) == [None]
+
+
+def test_daemon_already_running(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    Repo.init(tmp_path / "repo")
+    git_dir = str(tmp_path / "repo")
+    # the CLI's default options
+    options = {"max_entries": None, "untracked_files": None}
+    daemon = Daemon(options)
+    with serving(daemon, [git_dir]):
+        wait_for_snapshot(git_dir, daemon.path, lambda snapshot: True, options=options)
+        with pytest.raises(OSError):
+            Daemon(path=daemon.path).serve()
+        # the first daemon is still listening, and answers for the CLI
+        monkeypatch.setattr(summary_main, "report", None)
+        result = CliRunner().invoke(summary_main.cli, [git_dir])
+        assert result.exit_code == 0, result.output
+        assert git_dir in result.output.splitlines()[0]
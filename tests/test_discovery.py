@@ -0,0 +1,24 @@
+from git_utils.discovery import iter_repos
+
+
+def test_iter_repos(tmp_path):
+    (tmp_path / "b" / ".git").mkdir(parents=True)
+    (tmp_path / "A" / ".git").mkdir(parents=True)
+    (tmp_path / "worktree").mkdir()
+    (tmp_path / "worktree" / ".git").write_text("gitdir: ../b/.git/worktrees/x\n")
+    (tmp_path / "bare.git" / "objects").mkdir(parents=True)
+    (tmp_path / "bare.git" / "refs").mkdir()
+    (tmp_path / "bare.git" / "HEAD").write_text("ref: refs/heads/main\n")
+    (tmp_path / "deep" / "er" / "repo" / ".git").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / ".git").mkdir(parents=True)
+    (tmp_path / "deep" / "loop").symlink_to(tmp_path)
+
+    def relative(paths):
+        return [path[len(f"{tmp_path}/") :] for path in paths]
+
+    found = relative(iter_repos(str(tmp_path), maxdepth=None))
+    assert found == ["A", "b", "bare.git", "deep/er/repo", "worktree"]
+    found = relative(iter_repos(str(tmp_path), maxdepth=None, sortkey=None))
+    assert sorted(found) == sorted(["A", "b", "bare.git", "deep/er/repo", "worktree"])
+    found = relative(iter_repos(str(tmp_path), maxdepth=1))
+    assert found == ["A", "b", "bare.git", "worktree"]
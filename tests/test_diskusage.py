@@ -0,0 +1,36 @@
+import os
+
+from git import Repo
+
+from git_utils.diskusage import count_objects, disk_usage, objects_size
+
+
+def test_disk_usage(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "one.txt").write_text("x" * 1000)
+    (tmp_path / "a" / "b").mkdir()
+    (tmp_path / "a" / "b" / "two.txt").write_text("y" * 3000)
+    # hard links are only counted once, and symlinks are not followed
+    os.link(tmp_path / "a" / "b" / "two.txt", tmp_path / "a" / "two-link.txt")
+    os.symlink(tmp_path / "a", tmp_path / "a-link")
+    usage = disk_usage(tmp_path / "a")
+    assert usage.inodes == 4
+    directories_size = sum(
+        os.lstat(path).st_size for path in (tmp_path / "a", tmp_path / "a" / "b")
+    )
+    assert usage.apparent == 4000 + directories_size
+    assert usage.allocated >= 8192
+    assert disk_usage(tmp_path / "a", jobs=4) == usage
+    total = disk_usage(tmp_path)
+    assert total.inodes == usage.inodes + 2
+    assert disk_usage(tmp_path / "a" / "one.txt").apparent == 1000
+
+
+def test_objects_size(tmp_path):
+    repo = Repo.init(tmp_path)
+    assert objects_size(repo) == 0
+    (tmp_path / "file.txt").write_text("z" * 10000)
+    repo.index.add(["file.txt"])
+    repo.index.commit("Add file")
+    assert count_objects(repo)["count"] == 3
+    assert 0 < objects_size(repo) <= disk_usage(tmp_path / ".git" / "objects").allocated
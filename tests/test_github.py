@@ -0,0 +1,233 @@
+from email.utils import formatdate
+import time
+
+from git_utils.github import print_response
+from git_utils.github.cache import ResponseCache
+from git_utils.github.graphql import selection
+from git_utils.github.client import Client
+from git_utils.util import compile_fields
+from github_stub import paginate
+
+
+def test_iter_items_by_page(github_stub, github_client):
+    github_stub.routes["/orgs/example/repos"] = [{"id": i} for i in range(250)]
+    items = list(github_client.iter_items("/orgs/example/repos"))
+    assert items == [{"id": i} for i in range(250)]
+    pages = sorted(params.get("page", "1") for _, params in github_stub.requests)
+    assert pages == ["1", "2", "3"]
+
+
+def test_iter_items_by_cursor(github_stub, github_client):
+    def route(params, headers):
+        after = int(params.get("after", 0))
+        headers = {}
+        if after < 2:
+            url = f"http://{github_stub.netloc}/events?after={after + 1}"
+            headers["Link"] = f'<{url}>; rel="next"'
+        return 200, [{"after": after}], headers
+
+    github_stub.routes["/events"] = route
+    items = list(github_client.iter_items("/events"))
+    assert items == [{"after": 0}, {"after": 1}, {"after": 2}]
+
+
+def test_iter_items_empty_repo(github_stub, github_client):
+    github_stub.routes["/repos/example/empty/commits"] = lambda params, headers: (
+        409,
+        {"message": "Git Repository is empty."},
+        {},
+    )
+    assert list(github_client.iter_items("/repos/example/empty/commits")) == []
+
+
+def test_response_cache(github_stub, github_client, tmp_path):
+    github_client.cache = ResponseCache(tmp_path)
+    github_stub.routes["/user"] = lambda params, headers: (
+        200,
+        {"login": "example"},
+        {},
+    )
+    first = github_client.request("/user")
+    second = github_client.request("/user")
+    assert not getattr(first, "from_cache", False)
+    assert second.from_cache
+    assert first.json() == second.json() == {"login": "example"}
+    # different credentials don't share cached responses
+    github_client.session.headers["Authorization"] = "token other"
+    assert not getattr(github_client.request("/user"), "from_cache", False)
+    # responses are evicted once the cache is full
+    github_client.cache.max_bytes = 0
+    github_stub.routes["/user/emails"] = [{"email": "user@example.com"}]
+    github_client.request("/user/emails")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rate_limit_retry(github_stub, github_client):
+    sleeps = []
+    github_client.rate_limiter.sleep = sleeps.append
+    github_client.rate_limiter.clock = lambda: 1_700_000_000.0
+    retry_at = formatdate(1_700_000_030.0, usegmt=True)
+    responses = [
+        (403, {"message": "You have exceeded a secondary rate limit."}, {}),
+        (429, {"message": "Too many requests"}, {"Retry-After": "7"}),
+        (429, {"message": "Too many requests"}, {"Retry-After": retry_at}),
+        (200, {"login": "example"}, {}),
+    ]
+    github_stub.routes["/user"] = lambda params, headers: responses.pop(0)
+    assert github_client.request("/user").json() == {"login": "example"}
+    assert sleeps == [60.0, 7.0, 30.0]
+    assert github_client.rate_limiter.stats()[0]["retries"] == 3
+
+
+def test_rate_limit_token_pool(github_stub):
+    client = Client.from_token("aaaa", "bbbb")
+    client.scheme = "http"
+    client.netloc = github_stub.netloc
+    sleeps = []
+    client.rate_limiter.sleep = sleeps.append
+    remaining = {"token aaaa": 3, "token bbbb": 2}
+    reset = time.time() + 60
+
+    def route(params, headers):
+        authorization = headers["Authorization"]
+        if not remaining[authorization]:
+            rate_limit_headers = {"X-RateLimit-Remaining": "0"}
+            return 403, {"message": "API rate limit exceeded"}, rate_limit_headers
+        remaining[authorization] -= 1
+        rate_limit_headers = {
+            "X-RateLimit-Limit": "5",
+            "X-RateLimit-Remaining": str(remaining[authorization]),
+            "X-RateLimit-Reset": str(reset),
+        }
+        return 200, {"token": authorization}, rate_limit_headers
+
+    github_stub.routes["/user"] = route
+    tokens = [client.request("/user").json()["token"] for _ in range(5)]
+    # each request goes to the token with the most remaining (or unknown) budget
+    assert tokens == [
+        "token aaaa",
+        "token bbbb",
+        "token aaaa",
+        "token aaaa",
+        "token bbbb",
+    ]
+    assert sleeps == []
+    stats = {budget["token"]: budget for budget in client.rate_limiter.stats()}
+    assert stats["...aaaa"]["remaining"] == 0
+    assert stats["...bbbb"]["remaining"] == 0
+
+
+def stub_branches(github_stub):
+    """
+    Serve a repo with 250 commits on "main", and two feature branches.
+    """
+    history = {"main": [f"c{i:03d}" for i in range(250, 0, -1)]}
+    history["feature-a"] = ["a2", "a1"] + history["main"][50:]
+    history["feature-b"] = ["b1", "a1"] + history["main"][50:]
+    github_stub.routes["/repos/example/repo"] = lambda params, headers: (
+        200,
+        {"default_branch": "main"},
+        {},
+    )
+    github_stub.routes["/repos/example/repo/branches"] = [
+        {"name": name} for name in sorted(history)
+    ]
+    github_stub.routes["/repos/example/repo/commits"] = lambda params, headers: (
+        paginate(
+            [{"sha": sha} for sha in history[params["sha"]]],
+            "/repos/example/repo/commits",
+            params,
+        )
+    )
+    for name in ("feature-a", "feature-b"):
+        unique_shas = [sha for sha in history[name] if sha not in history["main"]]
+        github_stub.routes[f"/repos/example/repo/compare/main...{name}"] = (
+            lambda params, headers, unique_shas=unique_shas: (
+                200,
+                {"commits": [{"sha": sha} for sha in reversed(unique_shas)]},
+                {},
+            )
+        )
+    return history
+
+
+def test_iter_all_commits(github_stub, github_client):
+    history = stub_branches(github_stub)
+    shas = [
+        commit["sha"] for commit in github_client.iter_all_commits("example", "repo")
+    ]
+    assert sorted(shas) == sorted(set().union(*history.values()))
+    # pages are processed in branch order, round by round
+    assert shas == (
+        history["feature-a"][:100]
+        + ["b1"]
+        + history["main"][:50]
+        + history["feature-a"][100:]
+    )
+    # each branch stops paginating once it reaches commits that have been seen
+    commits_requests = [
+        (params["sha"], params.get("page", "1"))
+        for path, params in github_stub.requests
+        if path == "/repos/example/repo/commits"
+    ]
+    assert sorted(commits_requests) == [
+        ("feature-a", "1"),
+        ("feature-a", "2"),
+        ("feature-a", "3"),
+        ("feature-b", "1"),
+        ("main", "1"),
+    ]
+
+
+def test_iter_all_commits_compare(github_stub, github_client):
+    history = stub_branches(github_stub)
+    commits = github_client.iter_all_commits("example", "repo", compare=True)
+    shas = [commit["sha"] for commit in commits]
+    assert shas == history["main"] + ["a2", "a1", "b1"]
+
+
+def test_print_response_stream(github_stub, github_client, capsys):
+    owner = {"login": "x", "html_url": "..."}
+    items = [{"id": i, "url": "...", "name": "é", "owner": owner} for i in range(1000)]
+    github_stub.routes["/events"] = lambda params, headers: (200, items, {})
+    github_stub.routes["/user"] = lambda params, headers: (200, items[0], {})
+    outputs = []
+    for stream in (False, True):
+        for path in ("/events", "/user"):
+            with github_client.request(path, stream=stream) as response:
+                print_response(response, stream=stream)
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1]
+    assert outputs[0].startswith('{"id": 0, "name": "é", "owner": {"login": "x"}}\n')
+
+
+def test_print_response_fields(github_stub, github_client, capsys):
+    github_stub.routes["/user/repos"] = [
+        {"name": "a", "html_url": "...", "owner": {"login": "x", "id": 1}, "id": 2}
+    ]
+    fields = ["name", "html_url", "owner.login"]
+    print_response(github_client.request("/user/repos"), fields=fields)
+    assert capsys.readouterr().out == (
+        '{"html_url": "...", "name": "a", "owner": {"login": "x"}}\n'
+    )
+    assert list(github_client.iter_repos(fields=["owner.id"])) == [{"owner": {"id": 1}}]
+
+
+def test_iter_graphql_repos(github_stub, github_client):
+    fields = ["full_name", "owner.login", "pushed_at"]
+    nodes = selection(compile_fields(fields))
+    assert nodes == "full_name: nameWithOwner owner { login } pushed_at: pushedAt"
+
+    def route(params, headers):
+        assert nodes in params["query"]
+        assert params["variables"]["login"] == "example"
+        cursor = params["variables"]["cursor"]
+        page = {
+            "pageInfo": {"hasNextPage": cursor is None, "endCursor": "abc"},
+            "nodes": [{"full_name": f"example/{cursor}"}],
+        }
+        return 200, {"data": {"repositoryOwner": {"repositories": page}}}, {}
+
+    github_stub.routes["/graphql"] = route
+    repos = list(github_client.iter_graphql_repos("example", fields=fields))
+    assert repos == [{"full_name": "example/None"}, {"full_name": "example/abc"}]
@@ -0,0 +1,34 @@
+from git import Repo
+
+from git_utils.mirrors import MirrorCache
+from git_utils.repo import TemporaryRepo
+
+
+def test_mirror_cache(tmp_path):
+    urls = []
+    for name in ("one", "two"):
+        upstream = Repo.init(tmp_path / name)
+        upstream.git.commit("--allow-empty", message=name)
+        upstream.git.update_ref("refs/pull/1/head", "HEAD")
+        urls.append((tmp_path / name).as_uri())
+    cache = MirrorCache(tmp_path / "cache", max_bytes=0)
+
+    with TemporaryRepo.clone_from(urls[0], cache=cache) as repo:
+        assert repo.bare
+        assert [ref.path for ref in repo.refs] == [f"refs/heads/{repo.head.ref.name}"]
+        # mirrors in use are not evicted
+        cache.evict()
+        assert (tmp_path / "cache" / f"{cache.key(urls[0])}.git").exists()
+    # evicted once released, since max_bytes=0
+    assert not (tmp_path / "cache" / f"{cache.key(urls[0])}.git").exists()
+    assert not list((tmp_path / "cache").glob("*.lock"))
+
+    cache.max_bytes = None
+    with TemporaryRepo.clone_from(urls[1], cache=cache) as repo:
+        first_sha = repo.head.commit.hexsha
+    Repo(tmp_path / "two").git.commit("--allow-empty", message="three")
+    with TemporaryRepo.clone_from(urls[1], cache=cache) as repo:
+        # updated with fetch rather than cloned again
+        assert repo.head.commit.parents[0].hexsha == first_sha
+    assert (tmp_path / "cache" / f"{cache.key(urls[1])}.git").exists()
+    assert not list((tmp_path / "cache").glob("*.lock"))
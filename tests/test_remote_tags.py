@@ -0,0 +1,31 @@
+from click.testing import CliRunner
+from git import Repo
+
+from git_utils.remote_tags.__main__ import cli
+
+
+def test_cli_changed_only(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    urls = []
+    for name in ("one", "two"):
+        repo = Repo.init(tmp_path / name)
+        repo.git.commit("--allow-empty", message=name)
+        repo.create_tag(f"{name}-v1")
+        urls.append((tmp_path / name).as_uri())
+    runner = CliRunner()
+
+    result = runner.invoke(cli, [urls[0]])
+    assert result.output == "one-v1\n"
+
+    result = runner.invoke(cli, ["--changed-only", "--input", "-"], "\n".join(urls))
+    assert sorted(result.output.splitlines()) == [
+        f"{urls[0]}\tone-v1",
+        f"{urls[1]}\ttwo-v1",
+    ]
+    Repo(tmp_path / "two").create_tag("two-v2")
+    result = runner.invoke(cli, ["--changed-only", *urls])
+    assert result.output.splitlines() == [f"{urls[1]}\ttwo-v1", f"{urls[1]}\ttwo-v2"]
+
+    result = runner.invoke(cli, [*urls, (tmp_path / "missing").as_uri()])
+    assert result.exit_code == 1
+    assert len(result.stdout.splitlines()) == 3
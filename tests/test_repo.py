@@ -14,3 +14,133 @@ def test_heads_commits():
         "e2504d9c72ac83e904c755ef0364cc1d699e3db1",  # first commit
         "468b665ae1da7953b7f412642f0bdfcef8833a78",  # recent commit
     }
+
+
+def test_parse_status_v2():
+    output = "\0".join(
+        [
+            "# branch.oid cfed32f1f73e2dd1e1d450a29c7c6d10e7329cc4",
+            "# branch.head main",
+            "# branch.upstream origin/main",
+            "# branch.ab +1 -0",
+            "# stash 2",
+            "1 .M N... 100644 100644 100644 587be6b4 587be6b4 README.md",
+            "2 R. N... 100644 100644 100644 587be6b4 587be6b4 R100 g h",
+            "f",
+            "? new\nline",
+            "",
+        ]
+    )
+    headers, entries = git_utils.repo.parse_status_v2(output)
+    assert headers["branch.ab"] == "+1 -0"
+    assert headers["stash"] == "2"
+    assert entries == [(" M", "README.md"), ("R ", "f -> g h"), ("??", "new\nline")]
+
+
+def commit(repo: Repo, message: str) -> str:
+    repo.git.commit("--allow-empty", message=message)
+    return repo.head.commit.hexsha
+
+
+def test_iter_binshas_not_in_remotes_branches(tmp_path):
+    upstream_url = (tmp_path / "upstream.git").as_uri()
+    Repo.init(tmp_path / "upstream.git", bare=True)
+    local = Repo.clone_from(upstream_url, tmp_path / "local")
+    a = commit(local, "A")
+    b = commit(local, "B")
+    local.git.push("origin", "HEAD:refs/heads/main")
+    # branches that share pushed and unpushed history, including a merge
+    c = commit(local, "C")
+    local.git.branch("feature")
+    d = commit(local, "D")
+    local.git.checkout("-b", "other", b)
+    e = commit(local, "E")
+    local.git.merge("feature", "--no-edit")
+    merge = local.head.commit.hexsha
+    local.git.fetch()
+
+    heads = list(git_utils.repo.iter_heads_binshas(local))
+    assert len(heads) == len(set(heads)) == 6
+    assert {binsha.hex() for binsha in heads} == {a, b, c, d, e, merge}
+    binshas = list(git_utils.repo.iter_binshas_not_in_remotes(local))
+    assert len(binshas) == len(set(binshas))
+    assert {binsha.hex() for binsha in binshas} == {c, d, e, merge}
+
+
+def test_iter_commits_not_in_remotes(tmp_path):
+    Repo.init(tmp_path / "upstream.git", bare=True)
+    upstream_url = (tmp_path / "upstream.git").as_uri()
+    local = Repo.clone_from(upstream_url, tmp_path / "local")
+    commit(local, "A")
+    local.git.push("origin", "HEAD:refs/heads/main")
+    local.git.fetch()
+    b = commit(local, "B")
+    c = commit(local, "C")
+    # all remote heads are known locally
+    assert git_utils.repo.iter_commits_not_in_remotes(local) == {
+        local.commit(b),
+        local.commit(c),
+    }
+    assert git_utils.repo.iter_commits_not_in_remotes(local, clone=True) == {
+        local.commit(b),
+        local.commit(c),
+    }
+    # someone else pushes B (plus D) to upstream, which we haven't fetched
+    other = Repo.clone_from(upstream_url, tmp_path / "other")
+    other.git.fetch((tmp_path / "local").as_uri(), b)
+    other.git.reset("--hard", b)
+    d = commit(other, "D")
+    other.git.push("origin", "HEAD:refs/heads/main")
+    assert not git_utils.repo.has_object(local, d)
+    assert git_utils.repo.iter_commits_not_in_remotes(local) == {local.commit(c)}
+    assert not git_utils.repo.has_object(local, d)
+    assert git_utils.repo.iter_commits_not_in_remotes(local, clone=True) == {
+        local.commit(c)
+    }
+    assert git_utils.repo.iter_commits_not_in_remotes(
+        local, clone=True, compact=True
+    ) == {local.commit(c)}
+
+
+def test_iter_ls_remote_tags(tmp_path):
+    repo = Repo.init(tmp_path)
+    repo.git.commit("--allow-empty", message="first")
+    repo.create_tag("v1.0")
+    annotated = repo.create_tag("v1.1", message="annotated")
+    repo.create_tag("nightly-1")
+    url = tmp_path.as_uri()
+    head = repo.head.commit.hexsha
+
+    tags = list(git_utils.repo.iter_ls_remote_tags(url, peel=True))
+    assert tags == [
+        ("nightly-1", head, None),
+        ("v1.0", head, None),
+        ("v1.1", annotated.tag.hexsha, head),
+    ]
+    assert list(git_utils.repo.ls_remote_tags(url, "v1.*")) == [
+        (head, "v1.0"),
+        (annotated.tag.hexsha, "v1.1"),
+    ]
+
+
+def test_status_v2(tmp_path):
+    repo = Repo.init(tmp_path)
+    (tmp_path / "old name").write_text("content\n")
+    repo.index.add(["old name"])
+    repo.index.commit("first")
+    repo.git.mv("old name", "new\nname")
+    (tmp_path / "build").mkdir()
+    for index in range(5):
+        (tmp_path / "build" / f"artifact{index}").write_text("")
+
+    headers, entries, counts = git_utils.repo.status_v2(repo, untracked_files="all")
+    assert headers["branch.oid"] == repo.head.commit.hexsha
+    assert entries[0] == ("R ", "old name -> new\nname")
+    assert counts == {"R ": 1, "??": 5}
+
+    status = git_utils.repo.status_v2(repo, max_entries=2, untracked_files="all")
+    assert len(status.entries) == 2
+    assert status.counts == counts
+
+    status = git_utils.repo.status_v2(repo, untracked_files="normal")
+    assert status.entries[1:] == [("??", "build/")]
@@ -0,0 +1,46 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+# slow-to-import dependencies that no entry point should load until it needs them
+HEAVY = {"boto3", "botocore", "git", "pkg_resources", "requests"}
+# budget for the cumulative import time of each entry point, in microseconds
+BUDGET = 200_000
+
+
+def import_times(module: str) -> dict:
+    """
+    Import `module` in a fresh interpreter with `-X importtime`, and return the
+    cumulative import time of each module imported, in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:") :].split("|")
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module,allowed",
+    [
+        ("git_utils.github.__main__", set()),
+        ("git_utils.summary.__main__", set()),
+        ("git_utils.remote_tags.__main__", set()),
+        # most git-codecommit commands use git, but not all of them use botocore
+        ("git_utils.codecommit.__main__", {"git"}),
+    ],
+)
+def test_import_time(module, allowed):
+    times = import_times(module)
+    assert not (HEAVY - allowed) & set(times)
+    assert times[module] < BUDGET
@@ -0,0 +1,77 @@
+import os
+import time
+
+from git import Repo
+
+from git_utils.summary.cache import fingerprint, iter_index_paths, SnapshotCache
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_snapshot_cache(tmp_path):
+    repo = Repo.init(tmp_path / "repo")
+    repo.git.commit("--allow-empty", message="initial")
+    branch = repo.active_branch.name
+    upstream = f"refs/remotes/origin/{branch}"
+    repo.git.update_ref(upstream, "HEAD")
+    repo.git.config(f"branch.{branch}.remote", "origin")
+    repo.git.config(f"branch.{branch}.merge", f"refs/heads/{branch}")
+    assert upstream in [entry[0] for entry in fingerprint(repo)]
+    calls = []
+
+    def create(repo):
+        calls.append(repo.working_dir)
+        return {"count": len(calls)}
+
+    cache = SnapshotCache(tmp_path / "summary.json")
+    assert cache.get(repo, create, {}) == {"count": 1}
+    # hit
+    assert cache.get(repo, create, {}) == {"count": 1}
+    # miss after the upstream ref changes
+    touch(os.path.join(repo.git_dir, upstream), 1)
+    assert cache.get(repo, create, {}) == {"count": 2}
+    # miss after the index changes
+    (tmp_path / "repo" / "file").write_text("content")
+    repo.index.add(["file"])
+    touch(os.path.join(repo.git_dir, "index"), 2)
+    assert cache.get(repo, create, {}) == {"count": 3}
+    # miss after a tracked file is edited in place
+    (tmp_path / "repo" / "file").write_text("changed")
+    touch(tmp_path / "repo" / "file", 3)
+    assert cache.get(repo, create, {}) == {"count": 4}
+    assert cache.get(repo, create, {}) == {"count": 4}
+    # miss with different options
+    assert cache.get(repo, create, {"max_entries": 1}) == {"count": 5}
+
+    cache.save()
+    cache = SnapshotCache(tmp_path / "summary.json").load()
+    assert cache.get(repo, create, {"max_entries": 1}) == {"count": 5}
+    cache.clear()
+    assert cache.get(repo, create, {"max_entries": 1}) == {"count": 6}
+
+
+def test_snapshot_cache_eviction(tmp_path):
+    repos = [Repo.init(tmp_path / name) for name in ("old", "new", "deleted")]
+    cache = SnapshotCache(tmp_path / "summary.json", max_age=60)
+    for repo in repos:
+        cache.get(repo, lambda repo: {}, {})
+    cache.entries[repos[0].working_dir]["used"] = time.time() - 120
+    os.rename(repos[2].working_dir, tmp_path / "moved")
+    cache.save()
+    cache = SnapshotCache(tmp_path / "summary.json").load()
+    assert list(cache.entries) == [repos[1].working_dir]
+
+
+def test_iter_index_paths(tmp_path):
+    repo = Repo.init(tmp_path)
+    paths = ["a/b/one", "a/b/two", "a/x", "z" * 100]
+    for path in paths:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(path)
+    repo.git.add(".")
+    for version in ("2", "4"):
+        repo.git.update_index("--index-version", version)
+        data = (tmp_path / ".git" / "index").read_bytes()
+        assert [path.decode() for path in iter_index_paths(data)] == paths
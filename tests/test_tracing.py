@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+import json
+
+from click.testing import CliRunner
+import git
+import pytest
+
+from git_utils import tracing
+from git_utils.repo import iter_rev_list_binshas
+from git_utils.summary.__main__ import cli as summary_cli
+
+
+def test_trace_git_and_http(tmp_path, github_stub, github_client):
+    github_stub.routes["/user"] = lambda params, headers: (200, {"login": "x"}, {})
+    tracing.start()
+    try:
+        repo = git.Repo.init(tmp_path)
+        repo.git.status()
+        github_client.request("/user")
+    finally:
+        tracer = tracing.stop()
+    assert git.Git.execute is not tracing.traced_git_execute
+    events = {event["name"]: event for event in tracer.events}
+    assert events["git status"]["args"]["status"] == 0
+    assert events["git status"]["args"]["cwd"] == str(tmp_path)
+    assert events["GET /user"]["args"]["status"] == 200
+    assert events["GET /user"]["args"]["bytes"] == len('{"login": "x"}')
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in tracer.events)
+
+
+def test_trace_git_process(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    repo.index.commit("initial")
+    tracing.start()
+    try:
+        binshas = list(iter_rev_list_binshas(repo, "HEAD"))
+    finally:
+        tracer = tracing.stop()
+    assert len(binshas) == 1
+    (event,) = [event for event in tracer.events if event["name"] == "git rev-list"]
+    assert event["args"]["status"] == 0
+    assert event["args"]["stdout_bytes"] == 41
+
+
+def test_trace_interrupted_aws_call(monkeypatch):
+    def make_api_call(self, operation_name, api_params):
+        raise KeyboardInterrupt
+
+    monkeypatch.setitem(tracing.originals, "boto", make_api_call)
+    service_model = SimpleNamespace(service_name="codecommit")
+    client = SimpleNamespace(
+        meta=SimpleNamespace(service_model=service_model, region_name="us-east-1")
+    )
+    tracer = tracing.Tracer()
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    with pytest.raises(KeyboardInterrupt):
+        tracing.traced_make_api_call(client, "ListRepositories", {})
+    (event,) = tracer.events
+    assert event["name"] == "codecommit.ListRepositories"
+    assert event["args"]["status"] is None
+
+
+def test_profile_option(tmp_path):
+    git.Repo.init(tmp_path / "repo")
+    profile_path = tmp_path / "trace.json"
+    runner = CliRunner()
+    result = runner.invoke(
+        summary_cli, ["--profile", str(profile_path), str(tmp_path / "repo")]
+    )
+    assert result.exit_code == 0, result.output
+    assert "slowest" in result.output
+    trace = json.loads(profile_path.read_text())
+    categories = {event["cat"] for event in trace["traceEvents"]}
+    assert categories == {"git", "repo"}
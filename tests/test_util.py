@@ -1,4 +1,10 @@
-from git_utils.util import LazySet
+import json
+import os
+
+import pytest
+
+from git_utils.util import BinshaSet, LazySet, compile_fields, decode_json_stream
+from git_utils.util import project
 
 
 def range_and_raise(*args):
@@ -11,3 +17,49 @@ def test_lazy_set():
     xs = LazySet(range_and_raise(3))
     assert 2 in xs
     assert 1 in xs
+
+
+def test_binsha_set():
+    binshas = [os.urandom(20) for _ in range(5000)] + [bytes(20)]
+    xs = BinshaSet(binshas + binshas[:10])
+    assert binshas[100] in xs
+    assert os.urandom(20) not in xs
+    assert len(xs) == len(binshas)
+    assert set(xs) == set(binshas)
+    assert all(binsha in xs for binsha in binshas)
+
+
+def test_decode_json_stream():
+    items = [{"a": [1, {"b": "c]"}]}, 12345, "x,y", None, [], 6.5e-3]
+    text = json.dumps(items, indent=1)
+    # arrays are decoded item by item, regardless of how the text is split up
+    for size in (1, 7, len(text)):
+        chunks = (text[i : i + size] for i in range(0, len(text), size))
+        assert list(decode_json_stream(chunks)) == items
+    assert list(decode_json_stream([" [", "]"])) == []
+    assert decode_json_stream(['{"a"', ": 1}"]) == {"a": 1}
+    with pytest.raises(json.JSONDecodeError):
+        list(decode_json_stream(["[1, 2"]))
+    with pytest.raises(json.JSONDecodeError):
+        list(decode_json_stream(["[1 2]"]))
+
+
+def test_project():
+    tree = compile_fields(["name", "owner.login", "owner", "a.b.c", "a.b.d", "a.e"])
+    assert tree == {
+        "name": None,
+        "owner": None,
+        "a": {"b": {"c": None, "d": None}, "e": None},
+    }
+    value = {
+        "name": "x",
+        "id": 1,
+        "owner": {"login": "y"},
+        "a": [{"b": {"c": 2, "f": 3}}],
+    }
+    assert project(value, tree) == {
+        "name": "x",
+        "owner": {"login": "y"},
+        "a": [{"b": {"c": 2}}],
+    }
+    assert project(value, None) is value